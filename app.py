@@ -1,6 +1,15 @@
 import streamlit as st
 from flyer import Flyer
-from PIL import Image
+from layers import LayeredFlyer
+from font_registry import preload_fonts
+from assets import open_image
+from export import export_image, extension, PRESETS
+from tracing import Tracer
+from template_spec import available_templates, compiled_template, template_path, scale_factor, DEFAULT_TEMPLATE
+from layout import scale_value
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
 import io
 import os
 
@@ -41,10 +50,18 @@ if "use_footer" not in st.session_state:
 # remove_bg_api_key = st.sidebar.text_input("Enter your RemoveBG API Token")
 remove_bg_api_key = None
 
+# Offline background removal for product shots on plain backdrops
+bg_removal = "local" if st.sidebar.checkbox("Remove plain backgrounds (offline)", value=False) else None
+
 
 st.sidebar.header("Flyer Type Selection")
 flyer_type = st.sidebar.selectbox("Choose Flyer Type", ["phone", "laptop"], index=0)
 
+# Positions and boxes come from a template file in templates/, scaled to the uploaded background
+templates = available_templates()
+template_name = st.sidebar.selectbox("Layout Template", templates,
+                                     index=templates.index(DEFAULT_TEMPLATE) if DEFAULT_TEMPLATE in templates else 0)
+
 
 # -------------------------------
 # SIDEBAR: BASIC CONFIGURATION
@@ -76,13 +93,9 @@ else:
 # -------------------------------
 
 st.sidebar.header("Font Settings")
-
-# Load fonts
-font_folder = "./fonts"
-available_fonts = [f for f in os.listdir(font_folder) if f.lower().endswith(".ttf")]
-
-# Preset colors
-preset_colors = {"Black": "#000000", "Red": "#FF0000", "Green": "#00FF00"}
+fit_text = st.sidebar.checkbox("Shrink text to fit its box", value=False,
+                               help="Long titles, subtitles and footer texts get the largest size that fits, "
+                                    "the sizes below are the maximums")
 
 # Parts to configure (super short format)
 parts = [
@@ -92,6 +105,19 @@ parts = [
     ("Body", "Poppins-Regular.ttf", 90),
 ]
 
+@st.cache_resource
+def load_font_catalogue(font_folder, sizes):
+    """List the fonts and parse them (default sizes included) once per process, not on every rerun."""
+    preload_fonts(font_folder, sizes=sizes)
+    return [f for f in os.listdir(font_folder) if f.lower().endswith(".ttf")]
+
+# Load fonts
+font_folder = "./fonts"
+available_fonts = load_font_catalogue(font_folder, tuple(sorted({size for _, _, size in parts})))
+
+# Preset colors
+preset_colors = {"Black": "#000000", "Red": "#FF0000", "Green": "#00FF00"}
+
 font_settings = {}
 
 def font_section(name, default_font, default_size):
@@ -195,103 +221,238 @@ with col1:
                     st.session_state.footer_list.remove(idx)
 
 
-with col2:
-    st.header("Flyer Preview")
-
-    if st.button("Generate Flyer"):
-        if bg_img:
-            # Save temporary background
-            bg_temp = "temp_bg.png"
-            Image.open(bg_img).save(bg_temp)
-
+# -------------------------------
+# FLYER BUILDING
+# -------------------------------
+# Preview is rendered at this fraction of the background size with fast filters
+PREVIEW_SCALE = 0.25
+# Uploads kept in memory (encoded) across reruns and sessions
+UPLOAD_CACHE_ENTRIES = 32
+UPLOAD_CACHE_TTL = 30 * 60
+
+def upload_key(upload):
+    """Stable id of an uploaded file (Streamlit file id, else a hash of its bytes)."""
+    file_id = getattr(upload, "file_id", None)
+    return file_id or hashlib.sha256(upload.getvalue()).hexdigest()
+
+
+@st.cache_resource(max_entries=UPLOAD_CACHE_ENTRIES, ttl=UPLOAD_CACHE_TTL)
+def upload_bytes(key, _upload):
+    """
+    Encoded bytes of an upload, read once per file. Flyer decodes them itself, bounded to the
+    size each image is shown at (JPEG draft mode), and remove.bg gets the original file.
+    """
+    return _upload.getvalue()
+
+
+def collect_config():
+    """All the settings and uploads a flyer depends on, uploads as their encoded bytes."""
+    body = []
+    for kind, face, part in (("back", 'back', 'main'), ("front", 'front', 'main'), ("other", None, "other")):
+        if kind == "back" and flyer_type != "phone":
+            continue
+        for idx in st.session_state[f"{kind}_list"]:
+            f = st.session_state.get(f"{kind}{idx}")
+            if f:
+                body.append((f, face, part))
+
+    footer = []
+    if st.session_state.use_footer:
+        for idx in st.session_state.footer_list:
+            icon = st.session_state.get(f"footer_icon{idx}")
+            footer.append((icon, st.session_state.get(f"footer_txt{idx}", ""), idx))
+
+    config = {
+        "flyer_type": flyer_type, "vertical": is_vertical, "columns": use_two_columns, "template": template_name,
+        "fit_text": fit_text,
+        "bg_removal": bg_removal, "remove_bg_api_key": remove_bg_api_key,
+        "fonts": font_settings, "title": title_text, "subtitle": subtitle_text, "subtitle_desc": subtitle_desc,
+        "bg": bg_img, "logo": logo_img, "body": body, "footer": footer,
+    }
+
+    # Everything hashable goes into the key, uploads by their file id
+    key_data = dict(config,
+                    bg=upload_key(bg_img) if bg_img else None,
+                    logo=upload_key(logo_img) if logo_img else None,
+                    body=[(upload_key(f), face, part) for f, face, part in body],
+                    footer=[(upload_key(icon) if icon else None, txt, idx) for icon, txt, idx in footer])
+    key = hashlib.sha256(json.dumps(key_data, sort_keys=True, default=str).encode()).hexdigest()
+
+    # Read every upload at most once per file (the same bytes object, so layer keys compare by identity)
+    config["bg"] = upload_bytes(key_data["bg"], bg_img) if bg_img else None
+    config["logo"] = upload_bytes(key_data["logo"], logo_img) if logo_img else None
+    config["body"] = [(upload_bytes(upload_key(f), f), face, part) for f, face, part in body]
+    config["footer"] = [(upload_bytes(upload_key(icon), icon) if icon else None, txt, idx) for icon, txt, idx in footer]
+    return key, config
+
+
+@st.cache_resource
+def asset_executor():
+    """Threads shared by every session, preparing a flyer's images concurrently."""
+    return ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1) + 1)
+
+
+def template_fonts(config):
+    """
+    Font settings with the slider sizes scaled like the template's positions and boxes
+    (sizes are for the template's reference size, see template_spec.compile_spec).
+    """
+    if not config["template"]:
+        return config["fonts"]
+    path = template_path(config["template"])
+    factor = scale_factor(open_image(config["bg"]).size, compiled_template(path).size)  # header only
+    return {name: dict(font, size=scale_value(font["size"], factor)) for name, font in config["fonts"].items()}
+
+
+def new_flyer(config, scale=1.0, quality="final", tracer=None):
+    """Empty flyer (background, fonts and options only) for a config."""
+    fonts = template_fonts(config)
+    flyer_layout = None
+    if config["template"]:
+        compiled = compiled_template(template_path(config["template"]), open_image(config["bg"]).size)
+        flyer_layout = compiled.layout(config["flyer_type"])
+    return Flyer(
+                config["bg"],
+                fonts["Title"]["font"], fonts["Title"]["size"], fonts["Title"]["color"],
+                fonts["Body"]["font"], fonts["Body"]["size"], fonts["Body"]["color"],
+                fonts["Subheader"]["font"], fonts["Subheader"]["size"], fonts["Subheader"]["color"],
+                fonts["Subheader Description"]["font"], fonts["Subheader Description"]["size"],
+                fonts["Subheader Description"]["color"],
+                flyer_type=config["flyer_type"], vertical=config["vertical"],
+                remove_bg_api_key = config["remove_bg_api_key"],
+                bg_removal = config["bg_removal"],
+                scale = scale, quality = quality, tracer = tracer, flyer_layout = flyer_layout,
+                executor = asset_executor(), fit_text = config["fit_text"]
+            )
 
-            title_font            = font_settings["Title"]["font"]
-            title_font_size       = font_settings["Title"]["size"]
-            title_font_fill       = font_settings["Title"]["color"]
 
-            body_font             = font_settings["Body"]["font"]
-            body_font_size        = font_settings["Body"]["size"]
-            body_font_fill        = font_settings["Body"]["color"]
+def build_flyer(config, scale=1.0, quality="final", tracer=None):
+    """Build the flyer from a config (see collect_config). Returns the flyer and a list of error messages."""
+    errors = []
+    flyer = new_flyer(config, scale, quality, tracer)
+
+    # Apply logo
+    if config["logo"] is not None:
+        flyer.fix_logo(config["logo"])
+
+    # Title + Subtitle
+    flyer.create_title(config["title"])
+
+    flyer.create_subtitle(config["subtitle"], config["subtitle_desc"])
+
+    # Body images as (image, face, part)
+    body_items = config["body"]
+
+    # Remove the backgrounds of all body images concurrently
+    if config["remove_bg_api_key"] and body_items:
+        cutouts = flyer.process_and_remove_bg_many([item[0] for item in body_items])
+        body_items = [(cutout or f, face, part) for cutout, (f, face, part) in zip(cutouts, body_items)]
+
+    flyer.fit_body_many(body_items)
+
+    flyer.create_body(column=config["columns"])
+
+    # FOOTER
+    if config["footer"]:
+        flyer.fit_footer_many([(icon, txt, f"footer_{idx}") for icon, txt, idx in config["footer"] if icon is not None])
+
+        try:
+            flyer.create_footer()
+        except:
+            errors.append("Upload footer images and their text description")
+
+    return flyer, errors
+
+
+@st.cache_data(max_entries=8)
+def render_export(key, preset, _config):
+    """
+    Full resolution encoded flyer for a config hash and export preset, with the encode report and render trace.
+    Only the encoded file is cached, the full resolution canvas is dropped once it is encoded.
+    """
+    tracer = Tracer()
+    flyer, _ = build_flyer(_config, 1.0, "final", tracer)
+    trace = tracer.report()
+    buf = io.BytesIO()
+    report = export_image(flyer.background, buf, **PRESETS[preset])
+    trace = dict(trace, stages=dict(trace["stages"], export={"seconds": report["seconds"], "calls": 1}),
+                 counters=dict(trace["counters"], bytes_encoded=report["bytes"]), total=trace["total"] + report["seconds"])
+    return buf.getvalue(), report, trace
+
+
+def show_trace(trace, title):
+    """Per-stage timing breakdown of a render."""
+    with st.expander(f"{title}: {trace['total'] * 1000:.0f} ms"):
+        st.dataframe([{"stage": name, "ms": round(stage["seconds"] * 1000, 1), "calls": stage["calls"]}
+                      for name, stage in trace["stages"].items()], hide_index=True)
+        if trace["counters"]:
+            st.caption(", ".join(f"{name.replace('_', ' ')}: {value:,}" for name, value in trace["counters"].items()))
+
+
+def render_preview(config):
+    """
+    Preview through a LayeredFlyer kept in the session: every section is a cached layer,
+    so an edit only redraws the sections whose inputs changed.
+
+    Returns:
+        tuple: (image, error messages, trace of this rerun's work)
+    """
+    base_key = (upload_key(bg_img), config["template"], config["flyer_type"], config["vertical"],
+                config["fit_text"], config["bg_removal"], config["remove_bg_api_key"])
+    state = st.session_state.get("layered_preview")
+    if state is None or state[0] != base_key:
+        state = st.session_state.layered_preview = (base_key, LayeredFlyer(new_flyer(config, PREVIEW_SCALE, "preview")))
+    layered = state[1]
+    # Fresh tracer per rerun: the breakdown shows what this edit actually redrew
+    tracer = layered.flyer.tracer = Tracer()
+
+    fonts = template_fonts(config)
+    layered.set_fonts({role: (fonts[name]["font"], fonts[name]["size"], fonts[name]["color"])
+                       for role, name in (("title", "Title"), ("body", "Body"), ("subheader", "Subheader"),
+                                          ("subheader_desc", "Subheader Description"))})
+    layered.set_logo(config["logo"])
+    layered.set_title(config["title"])
+    layered.set_subtitle(config["subtitle"], config["subtitle_desc"])
+    layered.set_body(config["body"], config["columns"])
+
+    footer = [(icon, txt, f"footer_{idx}") for icon, txt, idx in config["footer"] if icon is not None]
+    layered.set_footer(footer)
+    errors = []
+    if config["footer"] and not footer:
+        errors.append("Upload footer images and their text description")
+    with tracer.span("composite"):
+        image = layered.composite()
+    return image, errors, tracer.report()
 
-            subheader_font        = font_settings["Subheader"]["font"]
-            subheader_font_size   = font_settings["Subheader"]["size"]
-            subheader_font_fill   = font_settings["Subheader"]["color"]
 
-            subheader_desc_font        = font_settings["Subheader Description"]["font"]
-            subheader_desc_font_size   = font_settings["Subheader Description"]["size"]
-            subheader_desc_font_fill   = font_settings["Subheader Description"]["color"]
+with col2:
+    st.header("Flyer Preview")
 
-            flyer = Flyer(
-                        bg_temp,
-                        title_font, title_font_size, title_font_fill,
-                        body_font, body_font_size, body_font_fill,
-                        subheader_font, subheader_font_size, subheader_font_fill,
-                        subheader_desc_font, subheader_desc_font_size, subheader_desc_font_fill,
-                        flyer_type=flyer_type, vertical=is_vertical,
-                        remove_bg_api_key = remove_bg_api_key
-                    )
+    if bg_img:
+        config_key, config = collect_config()
 
-            # Apply logo
-            if logo_img:
-                temp_logo = "temp_logo.png"
-                Image.open(logo_img).save(temp_logo)
-                flyer.fix_logo(temp_logo)
+        # Low resolution preview, only the sections that changed are redrawn
+        preview, errors, trace = render_preview(config)
+        for error in errors:
+            st.error(error)
+        st.image(preview, width='stretch')
+        st.caption("Preview. Generate the flyer for the full resolution version.")
+        show_trace(trace, "Preview timings")
 
-            # Title + Subtitle
-            flyer.create_title(title_text)
+    export_preset = st.selectbox("Download format", list(PRESETS), index=0,
+                                 help="png is lossless, whatsapp/instagram/webp are much smaller files")
 
-            flyer.create_subtitle(subtitle_text, subtitle_desc)
+    if st.button("Generate Flyer"):
+        if bg_img:
+            # Full resolution, print quality render only for the download (memoised by config hash)
+            data, report, trace = render_export(config_key, export_preset, config)
 
-            # Body - back
-            for idx in st.session_state.back_list:
-                f = st.session_state.get(f"back{idx}")
-                if f:
-                    path = f"temp_back_{idx}.png"
-                    Image.open(f).save(path)
-                    flyer.fit_body(path, 'back', 'main')
-
-            # Body - front
-            for idx in st.session_state.front_list:
-                f = st.session_state.get(f"front{idx}")
-                if f:
-                    path = f"temp_front_{idx}.png"
-                    Image.open(f).save(path)
-                    flyer.fit_body(path, 'front', 'main')
-
-            # Body - others
-            for idx in st.session_state.other_list:
-                f = st.session_state.get(f"other{idx}")
-                if f:
-                    path = f"temp_other_{idx}.png"
-                    Image.open(f).save(path)
-                    flyer.fit_body(path, part="other")
-
-            flyer.create_body(column=use_two_columns)
-
-            # FOOTER
-            if st.session_state.use_footer and st.session_state.footer_list:
-                for idx in st.session_state.footer_list:
-                    icon = st.session_state.get(f"footer_icon{idx}")
-                    txt = st.session_state.get(f"footer_txt{idx}", "")
-                    if icon:
-                        temp_icon = f"temp_footer_{idx}.png"
-                        Image.open(icon).save(temp_icon)
-                        flyer.fit_footer(temp_icon, txt)
-
-                try:
-                    flyer.create_footer()
-                except:
-                    st.error("Upload footer images and their text description")
-
-
-            # Show output
             st.success("Flyer generated!")
-            st.image(flyer.background, width='stretch')
+            st.caption(f"{report['format']}, {report['bytes'] / 1024:.0f} KB, encoded in {report['seconds']:.2f}s")
+            show_trace(trace, "Render timings")
 
             # Download
-            buf = io.BytesIO()
-            flyer.background.save(buf, format="PNG")
-            st.download_button("Download Flyer", data=buf.getvalue(), file_name="flyer.png")
+            st.download_button("Download Flyer", data=data, file_name=f"flyer.{extension(report['format'])}")
 
             # Mark flyer as generated
             st.session_state.flyer_generated = True
@@ -0,0 +1,151 @@
+"""
+Persistent store of preprocessed assets (trimmed body images, fitted footer
+icons and logos), keyed by a hash of the source file plus the operation
+parameters.
+
+The same product shots, icons and logos show up in hundreds of flyers. With a
+store, each one is decoded, trimmed and fitted once, later flyers (in any
+worker process) load the result instead. Entries are raw RGBA with a small
+header and are memory-mapped on load, so a hit costs no decode and no copy:
+the image shares the page cache with every other worker reading it. Writes,
+LRU bookkeeping and size-bounded eviction are those of CutoutCache.
+
+    python asset_store.py stats
+    python asset_store.py evict --max-bytes 1000000000
+"""
+from PIL import Image
+from cutout_cache import CutoutCache
+from assets import image_bytes
+import argparse
+import json
+import mmap
+import os
+import tempfile
+import struct
+import sys
+
+
+DEFAULT_STORE_DIR = os.path.join(".cache", "assets")
+DEFAULT_MAX_BYTES = 4 * 1024 ** 3  # 4 GB
+
+# magic, format version, width, height
+HEADER = struct.Struct("<4sIII")
+MAGIC = b"FLYA"
+VERSION = 1
+
+
+def write_asset(f, img):
+    """Write img to the binary file f as a raw RGBA asset (header + pixels)."""
+    if img.mode != "RGBA":
+        img = img.convert("RGBA")
+    f.write(HEADER.pack(MAGIC, VERSION, *img.size))
+    f.write(img.tobytes())
+
+
+def map_asset(f):
+    """
+    Read-only image memory-mapping the raw RGBA asset in the open file f.
+
+    Raises:
+        OSError: f is empty or not an asset file.
+    """
+    try:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:  # empty file
+        raise OSError(f"empty asset file {getattr(f, 'name', f)}")
+
+    magic, version, width, height = HEADER.unpack_from(mm) if len(mm) >= HEADER.size else (None,) * 4
+    if magic != MAGIC or version != VERSION or len(mm) != HEADER.size + width * height * 4:
+        mm.close()
+        raise OSError(f"not a valid asset file {getattr(f, 'name', f)}")
+
+    # Read-only image backed by the mapping (Pillow copies it if anything tries to modify it)
+    return Image.frombuffer("RGBA", (width, height), memoryview(mm)[HEADER.size:], "raw", "RGBA", 0, 1)
+
+
+def spill(img):
+    """
+    Move img out of the heap: it is written to an unlinked temporary file and the returned
+    function maps it back (no decode, no copy) on every call. The file goes away with the function.
+    """
+    f = tempfile.TemporaryFile()
+    write_asset(f, img)
+    f.flush()
+    return lambda: map_asset(f)
+
+
+class AssetStore(CutoutCache):
+    """
+    Disk store of preprocessed RGBA assets, memory-mapped on load.
+
+    Args:
+        store_dir (str): Directory holding the entries.
+        max_bytes (int): Size cap, the least recently used entries are evicted above it.
+    """
+
+    suffix = ".rgba"
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(store_dir, max_bytes)
+
+    def _read(self, path):
+        with open(path, "rb") as f:
+            return map_asset(f)
+
+    def _write(self, f, img):
+        write_asset(f, img)
+
+    def source_key(self, source, params):
+        """
+        Key of an asset made from source with the given operation parameters.
+
+        Returns:
+            str: The key, or None for already decoded PIL images (hashing their pixels
+            would cost about as much as preparing them, callers cache those themselves).
+        """
+        if isinstance(source, Image.Image):
+            return None
+        return self.key(image_bytes(source), params)
+
+    def fetch(self, source, params, prepare):
+        """
+        The asset for source and params: loaded from the store, or made with prepare() and stored.
+
+        Args:
+            source: Path, bytes or file-like object the asset is made from.
+            params (dict): JSON-serialisable parameters of the operation.
+            prepare (callable): Makes the asset on a miss.
+
+        Returns:
+            PIL.Image: The asset.
+        """
+        key = self.source_key(source, params)
+        if key is not None:
+            img = self.get(key)
+            if img is not None:
+                return img
+
+        img = prepare()
+        if key is not None:
+            self.put(key, img)
+        return img
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the preprocessed asset store.")
+    parser.add_argument("--store-dir", default=DEFAULT_STORE_DIR)
+    parser.add_argument("--max-bytes", type=int, default=DEFAULT_MAX_BYTES)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="Show store size")
+    sub.add_parser("evict", help="Evict down to the size cap")
+    args = parser.parse_args(argv)
+
+    store = AssetStore(args.store_dir, args.max_bytes)
+    if args.command == "evict":
+        store.evict()
+    print(json.dumps(store.stats(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+from PIL import Image
+from io import BytesIO
+import math
+import os
+
+
+def open_image(source):
+    """
+    Open an image from whatever the caller has at hand, without touching the filesystem
+    unless a path is given.
+
+    Args:
+        source: A PIL.Image, raw encoded bytes, a binary file-like object
+            (e.g. a Streamlit UploadedFile) or a path.
+
+    Returns:
+        PIL.Image: The image. PIL images are returned as is.
+    """
+    if isinstance(source, Image.Image):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return Image.open(BytesIO(source))
+    if hasattr(source, "read"):
+        if hasattr(source, "seek"):
+            source.seek(0)
+        return Image.open(source)
+    return Image.open(source)
+
+
+# Modes Image.reduce does not handle (or would average palette indices of), and what to reduce them as
+REDUCE_MODES = {"P": "RGBA", "PA": "RGBA", "1": "L", "I;16": "I", "I;16L": "I", "I;16B": "I", "I;16N": "I"}
+
+
+def reduce_image(img, factor):
+    """img.reduce(factor) (box filter), palette, 1 bit and 16 bit images are converted first."""
+    if img.mode in REDUCE_MODES:
+        img = img.convert(REDUCE_MODES[img.mode])
+    return img.reduce(factor)
+
+
+def _bound_scale(size, max_size, oversample):
+    return min(max_size[0] / size[0], max_size[1] / size[1]) * oversample
+
+
+def open_bounded(source, max_size, oversample=1.0, trim=False, mode=None):
+    """
+    Open an image decoded at the lowest resolution that still covers the size it is shown at
+    in max_size, so the cost depends on the output size, not on the upload.
+
+    JPEGs are decoded at 1/2, 1/4 or 1/8 scale straight from the DCT coefficients (draft mode),
+    other images are reduced (box filter) after decoding. The result is less than 2x
+    larger than needed, the caller resizes it to the exact box.
+
+    With trim, the empty border (getbbox) is cropped before the image is reduced, so the bound
+    is that of the subject, not of a padded canvas. A JPEG draft too small for the trimmed
+    subject is decoded again at the resolution the subject needs.
+
+    Args:
+        source: Anything open_image accepts.
+        max_size (tuple): (width, height) of the largest box the image can end up in.
+        oversample (float): Extra resolution to keep, e.g. for a border that is only removed later.
+        trim (bool): Crop to the bounding box of the non-empty pixels.
+        mode (str): Convert to this mode first (before trimming, e.g. "RGBA" to trim on alpha only).
+
+    Returns:
+        PIL.Image: The (possibly trimmed and reduced) image.
+    """
+    img = open_image(source)
+    full = img.size
+    draftable = img is not source and img.format == "JPEG"
+
+    def decode(img, scale):
+        if draftable and scale < 0.5:
+            # only takes effect before the pixels are loaded
+            img.draft(img.mode, (max(1, math.ceil(full[0] * scale)), max(1, math.ceil(full[1] * scale))))
+        if mode is not None and img.mode != mode:
+            img = img.convert(mode)
+        return img
+
+    img = decode(img, _bound_scale(full, max_size, oversample))
+
+    if trim:
+        bbox = img.getbbox()
+        if bbox is not None:
+            if img.size != full:
+                # The draft was picked for the whole frame, check it still covers the trimmed subject
+                fx, fy = full[0] / img.width, full[1] / img.height
+                needed = _bound_scale(((bbox[2] - bbox[0]) * fx, (bbox[3] - bbox[1]) * fy), max_size, oversample)
+                if img.width / full[0] < min(needed, 1.0):
+                    img = decode(open_image(source), needed)
+                    bbox = img.getbbox()
+            img = img.crop(bbox)
+
+    w, h = img.size
+    scale = _bound_scale(img.size, max_size, oversample)
+    if scale >= 0.5:
+        return img  # nothing to gain
+    target = (max(1, math.ceil(w * scale)), max(1, math.ceil(h * scale)))
+    factor = min(w // target[0], h // target[1])
+    if factor >= 2:
+        return reduce_image(img, factor)
+    return img
+
+
+class LazyImage:
+    """
+    Handle of a prepared asset that holds no pixels.
+
+    Only the source, size and mode are kept; open() gets the pixels again (Flyer maps them
+    from the asset store or a temporary file) every time it is called, and the caller drops
+    it after pasting. Flyer stores these in
+    body_imgs/footer_img_list with lazy_assets=True, so a flyer holds at most one decoded
+    asset at a time instead of all of them.
+    """
+    __slots__ = ("source", "size", "mode", "_open")
+
+    def __init__(self, source, size, mode, open):
+        self.source = source
+        self.size = tuple(size)
+        self.mode = mode
+        self._open = open
+
+    @property
+    def width(self):
+        return self.size[0]
+
+    @property
+    def height(self):
+        return self.size[1]
+
+    def open(self):
+        """The asset's pixels (a new image on every call)."""
+        return self._open()
+
+    def __repr__(self):
+        return f"<LazyImage {self.mode} {self.size[0]}x{self.size[1]} of {source_name(self.source, type(self.source).__name__)}>"
+
+
+def loaded(img):
+    """Pixels of a LazyImage, PIL images as they are."""
+    return img.open() if isinstance(img, LazyImage) else img
+
+
+def has_transparency(img):
+    """True if the image has transparent pixels (alpha band below 255 or a transparent palette entry)."""
+    if "transparency" in img.info:
+        return True
+    if "A" in img.getbands():
+        return img.getchannel("A").getextrema()[0] < 255
+    return False
+
+
+def has_soft_alpha(img):
+    """True if the alpha band has values other than fully transparent/opaque (e.g. feathered cutouts)."""
+    return any(img.getchannel("A").histogram()[1:255])
+
+
+def image_bytes(source):
+    """
+    Return the encoded bytes of an image source (used for uploading to remove.bg).
+    PIL images are encoded as PNG.
+    """
+    if isinstance(source, Image.Image):
+        buf = BytesIO()
+        source.save(buf, format="PNG")
+        return buf.getvalue()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    if hasattr(source, "read"):
+        if hasattr(source, "seek"):
+            source.seek(0)
+        return source.read()
+    with open(source, "rb") as f:
+        return f.read()
+
+
+def source_name(source, default=None):
+    """Base name (without extension) of a path source, else default."""
+    if not isinstance(source, (str, os.PathLike)):
+        return default
+    name = os.fspath(source).replace("\\", "/")
+    return os.path.splitext(os.path.basename(name))[0]
@@ -0,0 +1,312 @@
+"""
+Headless batch renderer.
+
+Reads a manifest (CSV, JSON or Parquet) with one flyer per row and renders every
+row through Flyer on a process pool.
+
+    python batch.py catalogue.csv -o out/ -j 8
+
+Manifest columns (only title is required):
+    title, subtitle, subtitle_description, flyer_type ("phone"/"laptop"),
+    background, logo, front_images, back_images, other_images,
+    footer_icons, footer_texts, columns, vertical, fit_text, template, output
+
+fit_text shrinks a title, subtitle or footer text that would overflow its box
+(see Flyer). template names a file in templates/ (default: the one for the background, see
+template_spec.py). Image and footer columns hold lists. In JSON/Parquet they can be real lists, in
+CSV they are ";"-separated strings.
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from template import FlyerTemplate
+from template_spec import find_template, template_path
+from font_registry import preload_fonts
+from asset_store import AssetStore
+from export import PRESETS, VARIANTS, extension
+from tracing import Tracer, JsonLinesSink
+from removebg import shared_client
+from cutout_cache import DEFAULT_CACHE_DIR
+from manifest import read_manifest, as_list, as_bool
+import argparse
+import os
+import re
+import sys
+import time
+
+
+DEFAULT_BACKGROUND = "background/new.png"
+
+# Same defaults as the Streamlit app (used when there is no template file)
+DEFAULT_FONTS = {
+    "title": ("fonts/Poppins-Black.ttf", 200, "#000000"),
+    "subheader": ("fonts/Poppins-Regular.ttf", 150, "#000000"),
+    "subheader_desc": ("fonts/Poppins-Regular.ttf", 90, "#000000"),
+    "body": ("fonts/Poppins-Regular.ttf", 90, "#000000"),
+}
+
+
+def _slug(text):
+    return re.sub(r"[^A-Za-z0-9]+", "-", str(text)).strip("-")[:60] or "flyer"
+
+
+def output_path(row, index, out_dir, extension="png"):
+    name = row.get("output") or f"{index:05d}_{_slug(row.get('title', ''))}.{extension}"
+    return os.path.join(out_dir, name)
+
+
+def make_template(background, fonts=None, template=None):
+    """
+    FlyerTemplate for a background, laid out by a template file: the named one, else the one
+    for the background. fonts (as in DEFAULT_FONTS) overrides the file's fonts.
+    """
+    path = template_path(template) if template else find_template(background)
+    if template and path is None:
+        raise ValueError(f"No template file named {template!r}")
+    if path is not None:
+        return FlyerTemplate.from_file(path, background, fonts)
+    fonts = fonts or DEFAULT_FONTS
+    return FlyerTemplate(background, *fonts["title"], *fonts["body"], *fonts["subheader"], *fonts["subheader_desc"])
+
+
+def render_row(row, template=None, fonts=None, strict=False, asset_store=None, tracer=None, lazy_assets=False,
+               executor=None, remove_bg_client=None):
+    """
+    Render one manifest row into a Flyer.
+
+    Args:
+        row (dict): Manifest row.
+        template (FlyerTemplate): Optional already loaded template for row["background"].
+        fonts (dict): Font settings as in DEFAULT_FONTS overriding the template file's, used when no
+            template is given.
+        strict (bool): Raise ValueError if the layout does not fit, before anything is drawn.
+        asset_store (AssetStore): Optional store of preprocessed assets shared between rows and workers.
+        tracer (Tracer): Optional tracer timing the flyer's stages.
+        lazy_assets (bool): Keep body images and footer icons out of memory until they are pasted.
+        executor (Executor): Optional thread pool preparing the row's images concurrently.
+        remove_bg_client (RemoveBgClient): Cut out the body images (through its cutout cache) before fitting them.
+
+    Returns:
+        Flyer: The rendered flyer.
+    """
+    if template is None:
+        template = make_template(row.get("background") or DEFAULT_BACKGROUND, fonts, row.get("template") or None)
+
+    flyer = template.new_flyer(
+        flyer_type=row.get("flyer_type") or "phone",
+        vertical=as_bool(row.get("vertical")),
+        fit_text=as_bool(row.get("fit_text")),
+        asset_store=asset_store,
+        tracer=tracer,
+        lazy_assets=lazy_assets,
+        executor=executor,
+        remove_bg_client=remove_bg_client,
+        bg_removal="removebg" if remove_bg_client is not None else None,
+    )
+
+    title = row.get("title") or ""
+    subtitle = row.get("subtitle") or ""
+    subtitle_description = row.get("subtitle_description") or ""
+    columns = as_bool(row.get("columns"), default=True)
+
+    # Fit every asset first, so the layout can be checked before anything is resized or drawn
+    body = []
+    if flyer.flyer_type == "phone":
+        body += [(img, 'back', 'main') for img in as_list(row.get("back_images"))]
+    body += [(img, 'front', 'main') for img in as_list(row.get("front_images"))]
+    body += [(img, None, "other") for img in as_list(row.get("other_images"))]
+    if remove_bg_client is not None and body:
+        # Cutouts warmed with `cutout_cache.py warm` are cache hits, failed removals keep the original
+        cutouts = flyer.process_and_remove_bg_many([img for img, _, _ in body])
+        body = [(cutout or img, face, part) for cutout, (img, face, part) in zip(cutouts, body)]
+    flyer.fit_body_many(body)
+
+    icons = as_list(row.get("footer_icons"))
+    texts = as_list(row.get("footer_texts"))
+    flyer.fit_footer_many([(icon, texts[idx] if idx < len(texts) else "", f"footer_{idx}")
+                           for idx, icon in enumerate(icons)])
+
+    if strict:
+        problems = flyer.check_layout(title, subtitle, subtitle_description, columns)
+        if problems:
+            raise ValueError("; ".join(problems))
+
+    if row.get("logo"):
+        flyer.fix_logo(row["logo"])
+
+    flyer.create_title(title)
+    flyer.create_subtitle(subtitle, subtitle_description)
+    flyer.create_body(column=columns)
+    if icons:
+        flyer.create_footer()
+
+    return flyer
+
+
+# ---------- WORKER STATE (one copy per process) ----------
+_templates = {}
+_fonts = None
+_strict = False
+_asset_store = None
+_export = PRESETS["png"]
+_variants = None
+_trace_sink = None
+_lazy_assets = False
+_executor = None
+_remove_bg_client = None
+
+
+def _init_worker(fonts, font_folder, strict=False, asset_store_dir=None, export="png", trace_path=None,
+                 variants=None, lazy_assets=False, threads=0, remove_bg_api_key=None, cutout_dir=None):
+    global _fonts, _strict, _asset_store, _export, _variants, _trace_sink, _lazy_assets, _executor, _remove_bg_client
+    _fonts = fonts
+    _strict = strict
+    _export = PRESETS[export]
+    _variants = variants
+    _lazy_assets = lazy_assets
+    if threads > 1:
+        _executor = ThreadPoolExecutor(max_workers=threads)
+    if asset_store_dir:
+        _asset_store = AssetStore(asset_store_dir)
+    if remove_bg_api_key:
+        # One connection pool and cutout cache per worker, shared by all its rows
+        _remove_bg_client = shared_client(remove_bg_api_key, cutout_dir or DEFAULT_CACHE_DIR)
+    if trace_path:
+        _trace_sink = JsonLinesSink(trace_path)
+    preload_fonts(font_folder, sizes=sorted({size for _, size, _ in (fonts or DEFAULT_FONTS).values()}))
+
+
+def _template(path, name=None):
+    # One template (decoded background, fonts, compiled layout) per background and template file per worker
+    template = _templates.get((path, name))
+    if template is None:
+        template = _templates[path, name] = make_template(path, _fonts, name)
+    return template
+
+
+def _render_job(index, row, out_path):
+    t0 = time.perf_counter()
+    tracer = Tracer(_trace_sink, name=f"row-{index}") if _trace_sink is not None else None
+    try:
+        template = _template(row.get("background") or DEFAULT_BACKGROUND, row.get("template") or None)
+        flyer = render_row(row, template, strict=_strict, asset_store=_asset_store, tracer=tracer,
+                           lazy_assets=_lazy_assets, executor=_executor, remove_bg_client=_remove_bg_client)
+        if _variants:
+            # Every size from the one render: out_dir/<name>_<variant>.<ext>, out_path itself is not written
+            stem = os.path.splitext(os.path.basename(out_path))[0]
+            reports = flyer.export_variants(os.path.dirname(out_path), _variants, basename=stem, workers=1)
+            paths = [report["path"] for report in reports]
+        else:
+            flyer.export(out_path, **_export)
+            paths = [out_path]
+        return index, paths, time.perf_counter() - t0, None
+    except Exception as e:
+        return index, [], time.perf_counter() - t0, f"{type(e).__name__}: {e}"
+    finally:
+        if tracer is not None:
+            tracer.finish()
+
+
+def run_batch(rows, out_dir, workers=None, fonts=None, font_folder="./fonts", strict=False,
+              asset_store_dir=None, export="png", trace_path=None, variants=None, lazy_assets=False, threads=0,
+              remove_bg_api_key=None, cutout_dir=None, log=print):
+    """
+    Render all rows on a process pool, writing outputs as they finish.
+    A failing row is reported and skipped. With strict=True rows whose layout
+    does not fit are rejected before rendering. fonts (as in DEFAULT_FONTS)
+    overrides the template files' fonts. With asset_store_dir, trimmed and
+    fitted assets are kept on disk and shared by all workers (and later runs).
+    export names the encoder preset (see export.PRESETS). With trace_path, every
+    worker appends per-stage spans and a summary per row to that JSON lines file.
+    With variants (names from export.VARIANTS), every row is written in each of
+    those sizes instead of the single export output. lazy_assets bounds the
+    memory of rows with many images (see Flyer). threads > 1 gives every worker
+    a thread pool that prepares a row's images concurrently. With remove_bg_api_key,
+    body images are cut out through remove.bg and the cutout cache in cutout_dir
+    (default the one `cutout_cache.py warm` fills).
+
+    Returns:
+        dict: Summary with counts, failures, elapsed time and flyers per second.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    failures = []
+    done = 0
+    t0 = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(fonts, font_folder, strict, asset_store_dir, export, trace_path, variants, lazy_assets, threads, remove_bg_api_key, cutout_dir)) as pool:
+        ext = extension(PRESETS[export]["format"])
+        futures = [
+            pool.submit(_render_job, idx, row, output_path(row, idx, out_dir, ext))
+            for idx, row in enumerate(rows)
+        ]
+        for future in as_completed(futures):
+            index, paths, seconds, error = future.result()
+            if error:
+                failures.append({"row": index, "error": error})
+                log(f"[{index}] FAILED {error}")
+            else:
+                done += 1
+                log(f"[{index}] {', '.join(paths)} ({seconds:.2f}s)")
+
+    elapsed = time.perf_counter() - t0
+    return {
+        "rendered": done,
+        "failed": len(failures),
+        "failures": failures,
+        "elapsed": elapsed,
+        "flyers_per_second": done / elapsed if elapsed else 0.0,
+        "workers": workers,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render flyers for every row of a manifest.")
+    parser.add_argument("manifest", help="CSV, JSON/JSONL or Parquet manifest")
+    parser.add_argument("-o", "--out-dir", default="output", help="Output directory")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--font-folder", default="./fonts")
+    parser.add_argument("--strict", action="store_true", help="Reject rows whose layout overflows or overlaps")
+    parser.add_argument("--asset-store", metavar="DIR", default=None,
+                        help="Keep preprocessed assets in DIR and reuse them across rows, workers and runs "
+                             "(e.g. .cache/assets)")
+    parser.add_argument("--export", default="png", choices=sorted(PRESETS),
+                        help="Output encoder preset (png is lossless, whatsapp/instagram/webp are much smaller)")
+    parser.add_argument("--variants", default=None,
+                        help=f"Comma-separated output sizes to write instead of --export, or 'all' ({', '.join(VARIANTS)})")
+    parser.add_argument("--lazy-assets", action="store_true",
+                        help="Keep body images and footer icons in a temporary file (or the --asset-store) "
+                             "until they are pasted (less memory)")
+    parser.add_argument("--threads", type=int, default=0,
+                        help="Threads per worker preparing a row's images concurrently (for few workers, many images)")
+    parser.add_argument("--remove-bg", action="store_true",
+                        help="Cut out body images with remove.bg (cached, warm the cache with cutout_cache.py warm)")
+    parser.add_argument("--api-key", default=os.environ.get("REMOVE_BG_API_KEY"), help="remove.bg API key")
+    parser.add_argument("--cutout-cache", metavar="DIR", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--trace", metavar="PATH", default=None,
+                        help="Append per-stage timings and counters of every row to this JSON lines file")
+    args = parser.parse_args(argv)
+
+    variants = None
+    if args.variants:
+        variants = list(VARIANTS) if args.variants == "all" else [name.strip() for name in args.variants.split(",")]
+        unknown = [name for name in variants if name not in VARIANTS]
+        if unknown:
+            parser.error(f"unknown variants: {', '.join(unknown)}")
+
+    if args.remove_bg and not args.api_key:
+        parser.error("--remove-bg needs --api-key or REMOVE_BG_API_KEY")
+
+    rows = read_manifest(args.manifest)
+    summary = run_batch(rows, args.out_dir, workers=args.workers, font_folder=args.font_folder,
+                        strict=args.strict, asset_store_dir=args.asset_store, export=args.export,
+                        trace_path=args.trace, variants=variants, lazy_assets=args.lazy_assets,
+                        threads=args.threads, remove_bg_api_key=args.api_key if args.remove_bg else None,
+                        cutout_dir=args.cutout_cache)
+
+    print(f"Rendered {summary['rendered']}/{len(rows)} flyers in {summary['elapsed']:.1f}s "
+          f"({summary['flyers_per_second']:.2f} flyers/s, {summary['workers']} workers), "
+          f"{summary['failed']} failed")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""
+Body/footer composition benchmark: the old group composites (a transparent
+canvas the size of the whole group, pasted onto the background) against the
+direct paste in Flyer.paste_group / Flyer.create_footer. Checks that both
+produce the same pixels.
+
+Pillow allocates image buffers with malloc, which tracemalloc does not see, so
+next to the tracemalloc peak (Python allocations only) each variant also
+reports its peak resident memory during composition (VmHWM after resetting it,
+Linux only). Every variant runs in a fresh process.
+
+Run from the repo root:
+    python benchmarks/bench_compose.py
+"""
+from PIL import Image, ImageDraw, ImageFilter
+import subprocess
+import tracemalloc
+import hashlib
+import ctypes
+import json
+import time
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flyer import Flyer
+
+
+def legacy_paste_group(self, group, imgs):
+    # Copy of the original composite: full group canvas, then one paste onto the background
+    composite = Image.new("RGBA", group.box.size, (0, 0, 0, 0))
+    for img, box in zip(imgs, group.items):
+        img = self.resize_to(img, box.size)
+        composite.paste(img, box.offset(group.box), img)
+    self.paste_on_background(composite, (group.box.x, group.box.y), composite)
+
+
+def legacy_create_footer(self):
+    footer = self.layout_footer()
+    composite = Image.new("RGBA", footer.box.size, (0, 0, 0, 0))
+    imgs = [img for icons in self.footer_img_list.values() for img in icons]
+    for img, box in zip(imgs, footer.items):
+        composite.paste(img, box.offset(footer.box))
+    self.paste_on_background(composite, (footer.box.x, footer.box.y), composite)
+
+
+def product_shot(size, colour, seed, soft=True):
+    """Synthetic cutout: a rounded shape on a transparent background, feathered like remove.bg output when soft."""
+    img = Image.new("RGBA", size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    w, h = size
+    draw.rounded_rectangle((w // 10, h // 20, w - w // 10, h - h // 20), radius=w // 6, fill=colour + (255,))
+    draw.ellipse((w // 3, h // 8 + seed, w // 3 + w // 8, h // 8 + w // 8 + seed), fill=(20, 20, 20, 255))
+    if soft:
+        img.putalpha(img.getchannel("A").filter(ImageFilter.GaussianBlur(3)))
+    return img
+
+
+def build(flyer_type, n_front, n_back, n_other, soft=True):
+    flyer = Flyer(
+        os.path.join(ROOT, "background", "new.png"),
+        os.path.join(ROOT, "fonts", "Poppins-Black.ttf"), 200, "#000000",
+        os.path.join(ROOT, "fonts", "Poppins-Regular.ttf"), 90, "#000000",
+        os.path.join(ROOT, "fonts", "Poppins-Regular.ttf"), 150, "#000000",
+        os.path.join(ROOT, "fonts", "Poppins-Regular.ttf"), 90, "#000000",
+        flyer_type=flyer_type,
+    )
+    flyer.background.load()  # decode now, not in the timed composition
+    for i in range(n_back):
+        flyer.fit_body(product_shot((700, 1400), (60, 60, 70), i, soft), 'back', 'main')
+    for i in range(n_front):
+        flyer.fit_body(product_shot((700, 1400), (30, 30, 40), i, soft), 'front', 'main')
+    for i in range(n_other):
+        flyer.fit_body(product_shot((500, 900), (120, 90, 200), i, soft), part="other")
+    for i in range(4):
+        flyer.fit_footer(product_shot((300, 300), (200, 40, 40), i), f"Footer item {i} with some text", name=f"f{i}")
+    return flyer
+
+
+def _trim():
+    # Hand freed blocks back to the OS, so the resident size reflects live memory only
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except OSError:
+        pass
+
+
+def _status_kb(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def run_variant(variant, case):
+    """Compose one case in this process. Returns timing, memory and a hash of the pixels."""
+    flyer = build(*case)
+    if variant == "legacy":
+        flyer.paste_group = legacy_paste_group.__get__(flyer)
+        flyer.create_footer = legacy_create_footer.__get__(flyer)
+
+    _trim()
+    rss_before = _status_kb("VmRSS")
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")  # reset the peak resident size (VmHWM)
+        hwm_supported = True
+    except OSError:
+        hwm_supported = False
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    flyer.create_body(column=True)
+    flyer.create_footer()
+    seconds = time.perf_counter() - t0
+    _, py_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "seconds": seconds,
+        "tracemalloc_peak": py_peak,
+        "rss_peak_delta": (_status_kb("VmHWM") - rss_before) * 1024 if hwm_supported else None,
+        "hash": hashlib.md5(flyer.background.tobytes()).hexdigest(),
+    }
+
+
+# (flyer_type, front, back, other images, feathered edges)
+CASES = [
+    ("phone", 2, 2, 2, True),
+    ("phone", 3, 3, 3, True),
+    ("phone", 3, 0, 3, False),
+    ("laptop", 2, 0, 3, True),
+    ("laptop", 2, 0, 3, False),
+]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        variant, case = sys.argv[1], json.loads(sys.argv[2])
+        print(json.dumps(run_variant(variant, case)))
+        sys.exit(0)
+
+    # Fixed mmap threshold: big buffers are unmapped when freed instead of lingering
+    # in the heap, so the resident size follows live memory
+    env = dict(os.environ, MALLOC_MMAP_THRESHOLD_="131072")
+
+    def spawn(variant, case, repeat=3):
+        runs = []
+        for _ in range(repeat):
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), variant, json.dumps(case)],
+                                 check=True, capture_output=True, text=True, env=env).stdout
+            runs.append(json.loads(out))
+        return min(runs, key=lambda r: r["seconds"])
+
+    mb = 1024 ** 2
+    print(f"{'case':<23}{'variant':<9}{'ms':>8}{'tracemalloc MB':>16}{'peak RSS MB':>13}")
+    for case in CASES:
+        results = {variant: spawn(variant, case) for variant in ("legacy", "direct")}
+        assert results["legacy"]["hash"] == results["direct"]["hash"], f"pixels differ for {case}"
+        for variant, r in results.items():
+            rss = f"{r['rss_peak_delta'] / mb:>13.1f}" if r["rss_peak_delta"] is not None else f"{'n/a':>13}"
+            label = "%s %d/%d/%d %s" % (*case[:4], "soft" if case[4] else "hard")
+            print(f"{label:<23}{variant:<9}{r['seconds'] * 1000:>8.1f}"
+                  f"{r['tracemalloc_peak'] / mb:>16.2f}{rss}")
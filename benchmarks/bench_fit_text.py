@@ -0,0 +1,73 @@
+"""
+Auto-fit text benchmark: the title size layout.fit_font_size finds for long
+product names (binary search on cached word metrics, nothing drawn) against
+trial and error the way it is done by hand: rasterise at the slider size, and
+step the size down by 5 until the block fits. Also checks the search against
+a measure-only scan of every size from the maximum down.
+
+Run from the repo root:
+    python benchmarks/bench_fit_text.py
+"""
+import time
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import layout
+from flyer import Flyer
+from bench_flyer import clear_caches
+from bench_lazy import FONTS
+
+TITLES = [
+    "Galaxy S24",
+    "Samsung Galaxy S24 Ultra 512GB Titanium Violet",
+    "Apple iPhone 15 Pro Max 1TB Natural Titanium Unlocked Dual eSIM",
+    "Lenovo ThinkPad X1 Carbon Gen 12 Intel Core Ultra 7 32GB RAM 1TB SSD 14 inch 2.8K OLED",
+    "Refurbished Grade A Google Pixel 8 Pro 256GB Obsidian with 12 Months Warranty and Free Screen Protector",
+]
+MAX_SIZE = 200
+STEP = 5
+
+
+def trial_and_error(flyer, title, geo):
+    size, renders = MAX_SIZE, 0
+    while True:
+        img, _ = flyer.rasterise_text(title, flyer.title_font, size, "#000000", geo.title_box_width, center=False)
+        renders += 1
+        if img.height <= geo.title_box_height or size <= STEP:
+            return size, renders
+        size -= STEP
+
+
+def linear_scan(title, geo):
+    for size in range(MAX_SIZE, 0, -1):
+        if layout._text_fits(title, FONTS[0], size, geo.title_box_width, geo.title_box_height, 0):
+            return size
+    return 1
+
+
+if __name__ == "__main__":
+    geo = layout.DEFAULT_GEOMETRY
+    flyer = Flyer(os.path.join(ROOT, "background", "new.png"), *FONTS)
+
+    print(f"{'chars':>6}{'search ms':>11}{'size':>6}{'by hand ms':>12}{'renders':>9}{'size':>6}  check")
+    total_search = total_hand = 0
+    for title in TITLES:
+        clear_caches()
+        layout.fit_font_size.cache_clear()
+        t0 = time.perf_counter()
+        size = layout.fit_font_size(title, FONTS[0], MAX_SIZE, geo.title_box_width, geo.title_box_height)
+        search = time.perf_counter() - t0
+
+        clear_caches()
+        t0 = time.perf_counter()
+        hand_size, renders = trial_and_error(flyer, title, geo)
+        hand = time.perf_counter() - t0
+
+        total_search += search
+        total_hand += hand
+        check = "ok" if size == linear_scan(title, geo) else "NOT LARGEST"
+        print(f"{len(title):>6}{search * 1000:>11.1f}{size:>6}{hand * 1000:>12.1f}{renders:>9}{hand_size:>6}  {check}")
+    print(f"{'total':>6}{total_search * 1000:>11.1f}{'':>6}{total_hand * 1000:>12.1f}")
@@ -0,0 +1,304 @@
+"""
+Stage-by-stage Flyer benchmark on synthetic assets.
+
+Generates a background, product shots (PNG cutouts and a JPEG photo), footer
+icons and a logo at realistic sizes, then renders phone and laptop flyers in
+one/two-column and vertical/horizontal side layouts. Every stage is a public
+Flyer call timed on its own (median of --repeat runs) with its tracemalloc peak
+and, on Linux, its peak resident memory (Pillow's pixel buffers are invisible to
+tracemalloc; set MALLOC_MMAP_THRESHOLD_=131072 for stable resident numbers, see
+bench_compose.py). side_images is the part of the body stage that pastes the
+side group, taken from the flyer's trace.
+
+    python benchmarks/bench_flyer.py -o results.json
+    python benchmarks/bench_flyer.py --baseline benchmarks/baseline.json   # exit 1 on regressions
+    python benchmarks/bench_flyer.py --save-baseline benchmarks/baseline.json
+
+Caches (fonts, word metrics, text blocks) are cleared before every run, so the
+numbers are those of a first flyer. Pass --warm to measure a flyer rendered
+after others, as in a batch worker.
+"""
+from PIL import Image, ImageDraw, ImageFilter
+import argparse
+import platform
+import random
+import statistics
+import tempfile
+import tracemalloc
+import json
+import time
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import PIL
+from flyer import Flyer
+from font_registry import font_registry
+from text_cache import text_cache
+from text_layout import word_metrics
+from tracing import Tracer
+from bench_compose import _trim, _status_kb
+
+
+FONTS = {
+    "title": (os.path.join(ROOT, "fonts", "Poppins-Black.ttf"), 200, "#000000"),
+    "body": (os.path.join(ROOT, "fonts", "Poppins-Regular.ttf"), 90, "#000000"),
+    "subheader": (os.path.join(ROOT, "fonts", "Poppins-Regular.ttf"), 150, "#000000"),
+    "subheader_desc": (os.path.join(ROOT, "fonts", "Poppins-Regular.ttf"), 90, "#333333"),
+}
+
+TITLE = "Samsung Galaxy S24 Ultra 512GB Titanium Black Dual SIM Unlocked Smartphone"
+SUBTITLE = ("Colour:", "Titanium Black, Titanium Gray, Titanium Violet and Titanium Yellow, more colours in store")
+FOOTER = ["1 Year Warranty", "Free Delivery within Lagos", "Pay on Delivery"]
+
+# name: (flyer_type, columns, vertical)
+SCENARIOS = {
+    "phone-2col-vertical": ("phone", True, True),
+    "phone-2col-horizontal": ("phone", True, False),
+    "phone-1col": ("phone", False, False),
+    "laptop-2col-vertical": ("laptop", True, True),
+    "laptop-2col-horizontal": ("laptop", True, False),
+    "laptop-1col": ("laptop", False, False),
+}
+
+# A stage counts as regressed when it is this much slower than the baseline, and by more than MIN_DELTA seconds
+DEFAULT_THRESHOLD = 0.2
+MIN_DELTA = 0.005
+
+
+# ---------- SYNTHETIC ASSETS ----------
+
+def _cutout(size, colour, rnd):
+    """Product shot with a feathered alpha edge, like remove.bg output."""
+    w, h = size
+    img = Image.new("RGBA", size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    draw.rounded_rectangle((w // 10, h // 20, w - w // 10, h - h // 20), radius=w // 6, fill=colour + (255,))
+    for _ in range(6):  # camera bumps, buttons...
+        x, y = rnd.randrange(w // 5, 4 * w // 5), rnd.randrange(h // 10, 9 * h // 10)
+        r = rnd.randrange(w // 30, w // 10)
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(rnd.randrange(256) for _ in range(3)) + (255,))
+    img.putalpha(img.getchannel("A").filter(ImageFilter.GaussianBlur(2)))
+    return img
+
+
+def make_assets(folder, seed=0):
+    """Write the synthetic assets into folder and return their paths."""
+    rnd = random.Random(seed)
+    paths = {}
+
+    # 4500x4500 background: smooth gradient with a few soft shapes, like a designed template
+    gradient = Image.linear_gradient("L").resize((4500, 4500))
+    background = Image.merge("RGBA", (gradient, gradient.transpose(Image.Transpose.ROTATE_90),
+                                      Image.new("L", (4500, 4500), 230), Image.new("L", (4500, 4500), 255)))
+    draw = ImageDraw.Draw(background)
+    for _ in range(12):
+        x, y, r = rnd.randrange(4500), rnd.randrange(4500), rnd.randrange(200, 900)
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(rnd.randrange(256) for _ in range(3)) + (255,))
+    paths["background"] = os.path.join(folder, "background.png")
+    background.save(paths["background"], compress_level=1)
+
+    for name, size in (("back", (1200, 2400)), ("front1", (1200, 2400)), ("front2", (1100, 2300)),
+                       ("side1", (900, 900)), ("side2", (900, 1200))):
+        paths[name] = os.path.join(folder, name + ".png")
+        _cutout(size, (rnd.randrange(40, 200),) * 3, rnd).save(paths[name], compress_level=1)
+
+    # A straight-from-the-phone 12 MP JPEG
+    photo = Image.new("RGB", (4000, 3000), (235, 235, 235))
+    photo.paste(_cutout((2000, 2600), (30, 30, 40), rnd), (1000, 200), _cutout((2000, 2600), (30, 30, 40), rnd))
+    paths["photo"] = os.path.join(folder, "photo.jpg")
+    photo.save(paths["photo"], quality=90)
+
+    for idx in range(len(FOOTER)):
+        paths[f"icon{idx}"] = os.path.join(folder, f"icon{idx}.png")
+        _cutout((512, 512), (200, 40, 40), rnd).save(paths[f"icon{idx}"])
+
+    paths["logo"] = os.path.join(folder, "logo.png")
+    _cutout((800, 400), (20, 60, 160), rnd).save(paths["logo"])
+    return paths
+
+
+# ---------- MEASUREMENT ----------
+
+class StageTimer:
+    """Times a sequence of stages, with tracemalloc and resident memory peaks per stage."""
+
+    def __init__(self):
+        self.stages = {}
+        try:
+            with open("/proc/self/clear_refs", "w") as f:
+                f.write("5")
+            self.rss = True
+        except OSError:
+            self.rss = False
+
+    def run(self, name, fn, *args, **kwargs):
+        _trim()
+        if self.rss:
+            rss_before = _status_kb("VmRSS")
+            with open("/proc/self/clear_refs", "w") as f:
+                f.write("5")  # reset the peak resident size
+        tracemalloc.reset_peak()
+        py_before, _ = tracemalloc.get_traced_memory()
+        t0 = time.perf_counter()
+        result = fn(*args, **kwargs)
+        seconds = time.perf_counter() - t0
+        _, py_peak = tracemalloc.get_traced_memory()
+        self.stages[name] = {
+            "seconds": seconds,
+            "tracemalloc_peak": py_peak - py_before,
+            "rss_peak": (_status_kb("VmHWM") - rss_before) * 1024 if self.rss else None,
+        }
+        return result
+
+    def add(self, name, seconds):
+        """A stage timed by the caller (e.g. a span within another stage), without memory peaks."""
+        self.stages[name] = {"seconds": seconds, "tracemalloc_peak": None, "rss_peak": None}
+
+
+def render(paths, flyer_type, columns, vertical, out_path):
+    """Render one flyer, stage by stage. Returns {stage: measurements}."""
+    timer = StageTimer()
+    tracer = Tracer()  # spans inside a stage, e.g. the side images of the body
+    flyer = timer.run("__init__", Flyer, paths["background"],
+                      *FONTS["title"], *FONTS["body"], *FONTS["subheader"], *FONTS["subheader_desc"],
+                      flyer_type=flyer_type, vertical=vertical, tracer=tracer)
+    timer.run("load_background", flyer.background.load)
+    timer.run("fix_logo", flyer.fix_logo, paths["logo"])
+    timer.run("create_title", flyer.create_title, TITLE)
+    timer.run("create_subtitle", flyer.create_subtitle, *SUBTITLE)
+
+    def fit_body():
+        if flyer_type == "phone":
+            flyer.fit_body(paths["back"], 'back', 'main')
+        flyer.fit_body(paths["front1"], 'front', 'main')
+        flyer.fit_body(paths["photo"], 'front', 'main')
+        if columns:
+            flyer.fit_body(paths["side1"], part="other")
+            flyer.fit_body(paths["side2"], part="other")
+    timer.run("fit_body", fit_body)
+
+    body_spans = len(tracer.spans)
+    body = getattr(flyer, f"create_{flyer_type}_body")
+    timer.run(f"create_{flyer_type}_body", body, columns)
+    # The body pastes the main group, then the side group (if any)
+    pastes = [span for span in tracer.spans[body_spans:] if span["name"] == "paste_group"]
+    if len(pastes) == 2:
+        timer.add("side_images", pastes[1]["seconds"])
+
+    def fit_footer():
+        for idx, text in enumerate(FOOTER):
+            flyer.fit_footer(paths[f"icon{idx}"], text, name=f"footer_{idx}")
+    timer.run("fit_footer", fit_footer)
+    timer.run("create_footer", flyer.create_footer)
+    timer.run("save", flyer.export, out_path)
+    return timer.stages
+
+
+def clear_caches():
+    font_registry.clear()
+    text_cache.clear()
+    word_metrics.cache_clear()
+
+
+def run_suite(paths, scenarios, repeat=3, warm=False):
+    """
+    Returns:
+        dict: {scenario: {stage: {"seconds": median, "tracemalloc_peak": max, "rss_peak": max}}}
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as out_dir:
+        for name in scenarios:
+            runs = []
+            for _ in range(repeat):
+                if not warm:
+                    clear_caches()
+                runs.append(render(paths, *SCENARIOS[name], os.path.join(out_dir, name + ".png")))
+
+            results[name] = {}
+            for stage in runs[0]:
+                py = [r[stage]["tracemalloc_peak"] for r in runs if r[stage]["tracemalloc_peak"] is not None]
+                rss = [r[stage]["rss_peak"] for r in runs if r[stage]["rss_peak"] is not None]
+                results[name][stage] = {
+                    "seconds": statistics.median(r[stage]["seconds"] for r in runs),
+                    "tracemalloc_peak": max(py) if py else None,
+                    "rss_peak": max(rss) if rss else None,
+                }
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Returns:
+        list[dict]: One row per stage present in both, with the time ratio and a regressed flag.
+    """
+    rows = []
+    for scenario, stages in results.items():
+        for stage, current in stages.items():
+            base = baseline.get(scenario, {}).get(stage)
+            if base is None:
+                continue
+            ratio = current["seconds"] / base["seconds"] if base["seconds"] else float("inf")
+            regressed = ratio > 1 + threshold and current["seconds"] - base["seconds"] > MIN_DELTA
+            rows.append({"scenario": scenario, "stage": stage, "baseline": base["seconds"],
+                         "current": current["seconds"], "ratio": ratio, "regressed": regressed})
+    return rows
+
+
+def machine_info():
+    return {"python": platform.python_version(), "pillow": PIL.__version__, "platform": platform.platform(),
+            "cpu_count": os.cpu_count()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every Flyer stage on synthetic assets.")
+    parser.add_argument("-o", "--output", help="Write the results as JSON")
+    parser.add_argument("--baseline", help="Compare against this results file, exit 1 on regressions")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Store the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Allowed slowdown before a stage counts as regressed (default {DEFAULT_THRESHOLD})")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Only these scenarios")
+    parser.add_argument("--warm", action="store_true", help="Keep font/text caches between runs")
+    args = parser.parse_args(argv)
+
+    tracemalloc.start()
+    with tempfile.TemporaryDirectory() as asset_dir:
+        paths = make_assets(asset_dir)
+        results = run_suite(paths, args.scenario or list(SCENARIOS), args.repeat, args.warm)
+    tracemalloc.stop()
+
+    mb = 1024 ** 2
+    print(f"{'scenario':<24}{'stage':<22}{'ms':>9}{'tracemalloc MB':>16}{'peak RSS MB':>13}")
+    for scenario, stages in results.items():
+        for stage, r in stages.items():
+            py = f"{r['tracemalloc_peak'] / mb:>16.2f}" if r["tracemalloc_peak"] is not None else f"{'n/a':>16}"
+            rss = f"{r['rss_peak'] / mb:>13.1f}" if r["rss_peak"] is not None else f"{'n/a':>13}"
+            print(f"{scenario:<24}{stage:<22}{r['seconds'] * 1000:>9.1f}{py}{rss}")
+
+    document = {"machine": machine_info(), "repeat": args.repeat, "warm": args.warm, "results": results}
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(document, f, indent=2)
+
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    rows = compare(results, baseline["results"], args.threshold)
+    regressions = [row for row in rows if row["regressed"]]
+    print(f"\nAgainst {args.baseline} (threshold {args.threshold:.0%}):")
+    for row in rows:
+        flag = "  REGRESSED" if row["regressed"] else ""
+        print(f"{row['scenario']:<24}{row['stage']:<22}{row['baseline'] * 1000:>9.1f} -> "
+              f"{row['current'] * 1000:>7.1f} ms ({row['ratio']:.2f}x){flag}")
+    print(f"{len(regressions)} regression(s)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
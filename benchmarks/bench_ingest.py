@@ -0,0 +1,80 @@
+"""
+Ingest benchmark: fitting a large phone photo as a body image and a footer icon,
+full decode (old fit_body/fit_footer) against the bounded decode in
+assets.open_bounded. Reports time and peak resident memory (see
+bench_compose.py), each variant in a fresh process.
+
+Run from the repo root:
+    python benchmarks/bench_ingest.py
+"""
+from PIL import Image, ImageDraw
+import subprocess
+import tempfile
+import json
+import time
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from assets import open_image, open_bounded
+from bench_compose import _trim, _status_kb
+
+# Body area and footer icon box of the default template (4500x4500 background)
+BODY_BOX = (3600, 2100)
+ICON_BOX = (150, 150)
+
+
+def photo(path, size):
+    """Synthetic product photo: a dark rounded shape on a light studio backdrop."""
+    img = Image.new("RGB", size, (235, 235, 235))
+    w, h = size
+    ImageDraw.Draw(img).rounded_rectangle((w // 4, h // 10, 3 * w // 4, 9 * h // 10), radius=w // 12,
+                                          fill=(30, 30, 40))
+    img.save(path, quality=90)
+
+
+def legacy_fit(path, box):
+    # Copy of the old ingest: full decode and trim at native size
+    img = open_image(path)
+    return img.crop(img.getbbox())
+
+
+def bounded_fit(path, box):
+    img = open_bounded(path, box, oversample=2 if box == ICON_BOX else 1)  # as in Flyer
+    return img.crop(img.getbbox())
+
+
+def run_variant(variant, path, box):
+    fit = legacy_fit if variant == "legacy" else bounded_fit
+    _trim()
+    rss_before = _status_kb("VmRSS")
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    t0 = time.perf_counter()
+    img = fit(path, box)
+    seconds = time.perf_counter() - t0
+    return {"seconds": seconds, "rss_peak_delta": (_status_kb("VmHWM") - rss_before) * 1024, "size": img.size}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 5:
+        variant, path, w, h = sys.argv[1:]
+        print(json.dumps(run_variant(variant, path, (int(w), int(h)))))
+        sys.exit(0)
+
+    env = dict(os.environ, MALLOC_MMAP_THRESHOLD_="131072")
+    mb = 1024 ** 2
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'input':<26}{'box':>11}{'variant':>9}{'ms':>9}{'peak RSS MB':>13}{'fitted':>12}")
+        for megapixels, size in ((12, (4000, 3000)), (48, (8000, 6000))):
+            path = os.path.join(tmp, f"photo_{megapixels}mp.jpg")
+            photo(path, size)
+            for box in (BODY_BOX, ICON_BOX):
+                for variant in ("legacy", "bounded"):
+                    out = subprocess.run([sys.executable, os.path.abspath(__file__), variant, path, *map(str, box)],
+                                         check=True, capture_output=True, text=True, env=env).stdout
+                    r = json.loads(out)
+                    print(f"{f'{megapixels} MP JPEG {size[0]}x{size[1]}':<26}{'%dx%d' % box:>11}{variant:>9}"
+                          f"{r['seconds'] * 1000:>9.1f}{r['rss_peak_delta'] / mb:>13.1f}{'%dx%d' % tuple(r['size']):>12}")
@@ -0,0 +1,154 @@
+"""
+Lazy asset benchmark: peak resident memory and time of a phone flyer with many
+large body shots (3 back, 3 front, 2 side) and footer icons, with the fitted
+images kept decoded in the flyer (default) against LazyImage handles
+(lazy_assets=True), and lazy handles backed by an asset store (second run, so
+every asset is a store hit). Each variant runs in a fresh process (see
+bench_compose.py for how peak RSS is measured); the peak is reported for the
+whole run and for pasting alone (create_body/create_footer).
+tests/test_lazy_memory.py checks these peaks against their bounds.
+
+Run from the repo root:
+    python benchmarks/bench_lazy.py
+"""
+from PIL import Image, ImageDraw
+import subprocess
+import tempfile
+import hashlib
+import json
+import time
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_compose import _trim, _status_kb
+
+SHOT_SIZE = (3000, 6000)
+FONTS = [os.path.join(ROOT, "fonts", "Poppins-Black.ttf"), 200, "#000000",
+         os.path.join(ROOT, "fonts", "Poppins-Regular.ttf"), 90, "#000000",
+         os.path.join(ROOT, "fonts", "Poppins-Regular.ttf"), 150, "#000000",
+         os.path.join(ROOT, "fonts", "Poppins-Regular.ttf"), 90, "#000000"]
+
+
+def make_assets(folder):
+    """Eight 18 MP product cutouts and three icons, as PNG files."""
+    paths = {"back": [], "front": [], "other": [], "icons": []}
+    for kind, count in (("back", 3), ("front", 3), ("other", 2)):
+        for idx in range(count):
+            img = Image.new("RGBA", SHOT_SIZE, (0, 0, 0, 0))
+            w, h = SHOT_SIZE
+            shade = 40 + 30 * idx
+            ImageDraw.Draw(img).rounded_rectangle((w // 10, h // 20, w - w // 10, h - h // 20), radius=w // 6,
+                                                  fill=(shade, shade, shade + 20, 255))
+            path = os.path.join(folder, f"{kind}{idx}.png")
+            img.save(path, compress_level=1)
+            paths[kind].append(path)
+    for idx in range(3):
+        img = Image.new("RGBA", (512, 512), (0, 0, 0, 0))
+        ImageDraw.Draw(img).ellipse((16, 16, 496, 496), fill=(200, 40, 40, 255))
+        path = os.path.join(folder, f"icon{idx}.png")
+        img.save(path)
+        paths["icons"].append(path)
+    return paths
+
+
+def run_variant(variant, folder, threads=0):
+    """
+    Render the flyer of make_assets (paths.json in folder) in this process.
+
+    Args:
+        variant (str): "eager", "lazy" or "lazy+store" (store in folder/store).
+        threads (int): Size of the Flyer's thread executor (0: none).
+
+    Returns:
+        dict: seconds, rss_peak_delta (whole run) and paste_peak_delta (create_body/create_footer)
+        in bytes, canvas_bytes, largest_asset_bytes, largest_source_bytes (decoded) and sha256.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from flyer import Flyer
+    from asset_store import AssetStore
+
+    with open(os.path.join(folder, "paths.json")) as f:
+        paths = json.load(f)
+    store = AssetStore(os.path.join(folder, "store")) if variant == "lazy+store" else None
+    executor = ThreadPoolExecutor(max_workers=threads) if threads else None
+    flyer = Flyer(os.path.join(ROOT, "background", "new.png"), *FONTS, flyer_type="phone",
+                  lazy_assets=variant != "eager", asset_store=store, executor=executor)
+    flyer.background.load()
+
+    def reset_peak():
+        _trim()
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return _status_kb("VmRSS")
+
+    rss_before = reset_peak()
+    t0 = time.perf_counter()
+    for path in paths["back"]:
+        flyer.fit_body(path, 'back', 'main')
+    for path in paths["front"]:
+        flyer.fit_body(path, 'front', 'main')
+    for path in paths["other"]:
+        flyer.fit_body(path, part="other")
+    for idx, path in enumerate(paths["icons"]):
+        flyer.fit_footer(path, f"Feature {idx}", name=f"footer_{idx}")
+    fitted = [img for imgs in flyer.body_imgs.values() for img in imgs]
+    fitted += [img for item in flyer.footer_img_list.values() for img in item]
+    fit_seconds = time.perf_counter() - t0
+    fit_peak = _status_kb("VmHWM") - rss_before
+
+    paste_before = reset_peak()
+    t0 = time.perf_counter()
+    flyer.create_body(column=True)
+    flyer.create_footer()
+    seconds = fit_seconds + time.perf_counter() - t0
+    paste_peak = _status_kb("VmHWM") - paste_before
+    if executor is not None:
+        executor.shutdown()
+
+    def nbytes(img):
+        return img.width * img.height * Image.getmodebands(img.mode)
+
+    with Image.open(paths["back"][0]) as source:
+        source_bytes = nbytes(source)
+    # the whole run's peak, measured in two parts (the paste part on top of what fitting kept)
+    return {"seconds": seconds, "rss_peak_delta": max(fit_peak, paste_before - rss_before + paste_peak) * 1024,
+            "paste_peak_delta": paste_peak * 1024, "canvas_bytes": nbytes(flyer.background),
+            "largest_asset_bytes": max(map(nbytes, fitted)), "largest_source_bytes": source_bytes,
+            "sha256": hashlib.sha256(flyer.background.tobytes()).hexdigest()}
+
+
+def run(variant, folder, threads=0, env=None):
+    """run_variant in a fresh process (peak RSS of this variant only)."""
+    env = dict(os.environ, MALLOC_MMAP_THRESHOLD_="131072", **(env or {}))
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), variant, folder, str(threads)],
+                         check=True, capture_output=True, text=True, env=env).stdout
+    return json.loads(out)
+
+
+def write_assets(folder):
+    """make_assets into folder, with the paths.json run_variant reads."""
+    with open(os.path.join(folder, "paths.json"), "w") as f:
+        json.dump(make_assets(folder), f)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4:
+        print(json.dumps(run_variant(sys.argv[1], sys.argv[2], int(sys.argv[3]))))
+        sys.exit(0)
+
+    mb = 1024 ** 2
+    with tempfile.TemporaryDirectory() as tmp:
+        write_assets(tmp)
+        run("lazy+store", tmp)  # fill the store
+        print(f"{'variant':<12}{'ms':>9}{'peak RSS MB':>13}{'paste MB':>10}  output")
+        hashes = set()
+        for variant in ("eager", "lazy", "lazy+store"):
+            r = min((run(variant, tmp) for _ in range(3)), key=lambda r: r["rss_peak_delta"])
+            hashes.add(r["sha256"])
+            print(f"{variant:<12}{r['seconds'] * 1000:>9.0f}{r['rss_peak_delta'] / mb:>13.1f}"
+                  f"{r['paste_peak_delta'] / mb:>10.1f}  {r['sha256'][:12]}")
+        print(f"canvas + 2 x largest asset: {(r['canvas_bytes'] + 2 * r['largest_asset_bytes']) / mb:.1f} MB")
+        print("identical output" if len(hashes) == 1 else "OUTPUTS DIFFER")
@@ -0,0 +1,69 @@
+"""
+Parallel asset preparation benchmark: the many-image phone flyer of
+bench_lazy.py (eight 18 MP body shots, three footer icons) fitted and pasted
+with no executor and with a thread pool of 2 and 4 threads (Flyer's executor).
+Decoding, trimming, resizing and PNG encoding release the GIL, so the speedup
+is bounded by the CPU count (printed first); every run must give the same pixels.
+
+Run from the repo root:
+    python benchmarks/bench_parallel.py [--repeat 3]
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import tempfile
+import hashlib
+import time
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_lazy import make_assets, FONTS
+from bench_flyer import clear_caches
+
+
+def render(paths, executor=None):
+    from flyer import Flyer
+
+    flyer = Flyer(os.path.join(ROOT, "background", "new.png"), *FONTS, flyer_type="phone", executor=executor)
+    flyer.background.load()
+
+    t0 = time.perf_counter()
+    flyer.fit_body_many([(path, 'back', 'main') for path in paths["back"]] +
+                        [(path, 'front', 'main') for path in paths["front"]] +
+                        [(path, None, "other") for path in paths["other"]])
+    flyer.fit_footer_many([(path, f"Feature {idx}", f"footer_{idx}") for idx, path in enumerate(paths["icons"])])
+    flyer.create_body(column=True)
+    flyer.create_footer()
+    seconds = time.perf_counter() - t0
+    return seconds, hashlib.sha256(flyer.background.tobytes()).hexdigest()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Flyer with a thread executor.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per thread count (the fastest is reported)")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs")
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_assets(tmp)
+        render(paths)  # warm up fonts and the OS file cache
+
+        print(f"{'threads':<10}{'ms':>9}{'speedup':>9}  output")
+        hashes = set()
+        baseline = None
+        for threads in (1, 2, 4):
+            runs = []
+            for _ in range(args.repeat):
+                clear_caches()
+                if threads == 1:
+                    runs.append(render(paths))
+                else:
+                    with ThreadPoolExecutor(max_workers=threads) as executor:
+                        runs.append(render(paths, executor))
+            seconds, digest = min(runs)
+            baseline = baseline or seconds
+            hashes.update(digest for _, digest in runs)
+            print(f"{threads:<10}{seconds * 1000:>9.0f}{baseline / seconds:>8.2f}x  {digest[:12]}")
+        print("identical output" if len(hashes) == 1 else "OUTPUTS DIFFER")
@@ -0,0 +1,69 @@
+"""
+Multi-variant export benchmark: every size of export.VARIANTS resized from the
+master and encoded one after the other (what re-exporting by hand amounts to)
+against export_variants (resize cascade, parallel encoding). Also reports how
+far each cascaded variant is from the one resized straight from the master
+(mean absolute difference per channel, 0-255, after encoding both the same way).
+
+Run from the repo root:
+    python benchmarks/bench_variants.py [flyer.png]
+"""
+from PIL import Image, ImageChops, ImageStat
+from io import BytesIO
+import tempfile
+import time
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from export import VARIANTS, PRESETS, export_variants, export_image, variant_scale, place
+from bench_flyer import make_assets, render
+
+
+def direct(img):
+    """Each variant from the master, encoded sequentially. Returns {name: encoded bytes}."""
+    encoded = {}
+    for name, spec in VARIANTS.items():
+        scale = variant_scale(img.size, spec["size"], spec["fit"])
+        scaled = img.resize((round(img.width * scale), round(img.height * scale)), Image.Resampling.LANCZOS)
+        buf = BytesIO()
+        export_image(place(scaled, spec["size"], spec["fit"]), buf, **PRESETS[spec["preset"]])
+        encoded[name] = buf.getvalue()
+    return encoded
+
+
+def master_image(path=None):
+    if path:
+        img = Image.open(path)
+        img.load()
+        return img
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "flyer.png")
+        render(make_assets(tmp), "phone", True, False, out)
+        img = Image.open(out)
+        img.load()
+        return img
+
+
+if __name__ == "__main__":
+    img = master_image(sys.argv[1] if len(sys.argv) > 1 else None)
+    print(f"master {img.width}x{img.height} {img.mode}, {len(VARIANTS)} variants, {os.cpu_count()} CPUs")
+
+    t0 = time.perf_counter()
+    reference = direct(img)
+    direct_seconds = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    reports = export_variants(img)
+    cascade_seconds = time.perf_counter() - t0
+
+    print(f"{'from master, sequential':<28}{direct_seconds * 1000:>9.0f} ms")
+    print(f"{'cascade, parallel encode':<28}{cascade_seconds * 1000:>9.0f} ms")
+    print(f"\n{'variant':<20}{'size':>11}{'KB':>8}{'mean abs diff':>15}")
+    for report in reports:
+        ours = Image.open(BytesIO(report["data"])).convert("RGB")
+        ref = Image.open(BytesIO(reference[report["name"]])).convert("RGB")
+        diff = sum(ImageStat.Stat(ImageChops.difference(ours, ref)).mean) / 3
+        print(f"{report['name']:<20}{'%dx%d' % report['size']:>11}{report['bytes'] / 1024:>8.0f}{diff:>15.2f}")
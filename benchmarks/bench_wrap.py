@@ -0,0 +1,82 @@
+"""
+Word-wrap benchmark: the old quadratic loop from Flyer.draw_wrapped_text
+against text_layout.wrap_lines. Also checks that both produce the same breaks.
+
+Run from the repo root:
+    python benchmarks/bench_wrap.py
+"""
+from PIL import Image, ImageDraw, ImageFont
+import random
+import time
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from text_layout import wrap_lines, word_metrics
+
+
+def legacy_wrap(text, font, box_width):
+    # Copy of the original loop: re-measures the whole growing line for every word
+    draw = ImageDraw.Draw(Image.new("RGBA", (box_width, 1000)))
+    lines = []
+    line = ""
+    for word in text.split():
+        test_line = line + " " + word if line else word
+        if draw.textlength(test_line, font=font) <= box_width:
+            line = test_line
+        else:
+            if line:
+                lines.append(line)
+            line = word
+    if line:
+        lines.append(line)
+    heights = [font.getbbox(line)[3] for line in lines]  # measure pass
+    widths = [draw.textlength(line, font=font) for line in lines]  # draw pass
+    heights = [font.getbbox(line)[3] for line in lines]
+    return lines
+
+
+def make_text(n_words, seed=0):
+    vocab = ("Titanium Black Gray Violet Yellow 512GB 256GB 12GB RAM Snapdragon 8 Gen 3 "
+             "6.8-inch QHD+ Dynamic AMOLED 2X 120Hz 200MP camera 5000mAh battery 45W fast "
+             "charging S Pen included Wi-Fi 7 Bluetooth 5.3 Dual SIM eSIM IP68 Android 14").split()
+    rnd = random.Random(seed)
+    return " ".join(rnd.choice(vocab) for _ in range(n_words))
+
+
+def cold_wrap(text, font, box_width):
+    # Empty word cache, so every distinct word is measured in the timed run
+    word_metrics.cache_clear()
+    return wrap_lines(text, font, box_width)
+
+
+def bench(fn, *args, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+if __name__ == "__main__":
+    cases = [
+        ("Poppins-Regular.ttf", 90, 2000),   # subtitle description
+        ("Poppins-Black.ttf", 200, 2500),    # title
+        ("Poppins-Regular.ttf", 90, 430),    # footer caption
+    ]
+    print(f"{'font':<22}{'size':>5}{'box':>6}{'words':>7}{'lines':>7}{'legacy ms':>11}{'new ms':>9}{'speedup':>9}")
+    for font_file, size, box in cases:
+        font = ImageFont.truetype(os.path.join(ROOT, "fonts", font_file), size)
+        for n_words in (20, 100, 500, 2000):
+            text = make_text(n_words)
+            expected = legacy_wrap(text, font, box)
+            got = [line.text for line in wrap_lines(text, font, box)]
+            assert got == expected, f"line breaks differ for {font_file} {size} {n_words}"
+
+            t_old = bench(legacy_wrap, text, font, box)
+            t_new = bench(cold_wrap, text, font, box)
+            print(f"{font_file:<22}{size:>5}{box:>6}{n_words:>7}{len(got):>7}"
+                  f"{t_old * 1000:>11.2f}{t_new * 1000:>9.2f}{t_old / t_new:>8.1f}x")
@@ -0,0 +1,215 @@
+"""
+Persistent, content-addressed cache for background-removed cutouts.
+
+Cutouts are stored as PNG files named after a hash of the input image bytes
+plus the removal parameters, so the same product photo is only sent to
+remove.bg once, whatever flyer variant it ends up in. Several processes can
+share one cache directory: writes are atomic renames and eviction tolerates
+files disappearing underneath it.
+
+Warm the cache for a whole catalogue before a batch run:
+
+    python cutout_cache.py warm catalogue.csv --api-key KEY
+    python cutout_cache.py stats
+"""
+from PIL import Image
+from manifest import read_manifest, as_list
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+
+
+DEFAULT_CACHE_DIR = os.path.join(".cache", "cutouts")
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 2 GB
+
+
+class CutoutCache:
+    """
+    Disk cache of RGBA cutouts with a size cap and LRU eviction (by file modification
+    time, which get() bumps on every hit).
+
+    Args:
+        cache_dir (str): Directory holding the cached PNGs.
+        max_bytes (int): Size cap, the least recently used cutouts are evicted above it.
+    """
+
+    # File extension of the entries (subclasses store other formats, see asset_store.py)
+    suffix = ".png"
+    # Other processes write to the same directory: the real total is re-read after
+    # this fraction of max_bytes was written here, so N writers overshoot by at most N times it
+    restat_ratio = 0.05
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._approx_bytes = self.total_bytes()
+        self._written = 0  # bytes written by this process since the directory was last measured
+
+    @staticmethod
+    def key(data, params=None):
+        """Hash of the input image bytes plus the removal parameters."""
+        h = hashlib.sha256(data)
+        h.update(json.dumps(params or {}, sort_keys=True).encode())
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + self.suffix)
+
+    def _read(self, path):
+        img = Image.open(path)
+        img.load()
+        return img
+
+    def _write(self, f, img):
+        img.save(f, format="PNG", compress_level=1)
+
+    def get(self, key):
+        """
+        Returns:
+            PIL.Image: The cached RGBA cutout, or None on a miss.
+        """
+        path = self._path(key)
+        try:
+            img = self._read(path)
+            os.utime(path)  # mark as recently used
+        except (FileNotFoundError, OSError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return img
+
+    def put(self, key, img):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temp file and rename, so other processes never see a partial PNG
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                self._write(f, img)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            self._approx_bytes += size
+            self._written += size
+            restat = self._approx_bytes > self.max_bytes or self._written >= self.max_bytes * self.restat_ratio
+            if restat:
+                self._written = 0
+        if restat:
+            total = self.total_bytes()  # includes what other processes wrote
+            with self._lock:
+                self._approx_bytes = total
+            if total > self.max_bytes:
+                self.evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(self.suffix):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue  # evicted by another process
+                yield path, st.st_size, st.st_mtime
+
+    def total_bytes(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, target_ratio=0.9):
+        """Delete least recently used cutouts until the cache is under target_ratio * max_bytes."""
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * target_ratio
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        with self._lock:
+            self._approx_bytes = total
+
+    def stats(self):
+        entries = list(self._entries())
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+
+def manifest_images(rows):
+    """Unique body image paths referenced by manifest rows, in order."""
+    seen = {}
+    for row in rows:
+        for column in ("front_images", "back_images", "other_images"):
+            for img in as_list(row.get(column)):
+                seen.setdefault(img, None)
+    return list(seen)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the background-removed cutout cache.")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--max-bytes", type=int, default=DEFAULT_MAX_BYTES)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    warm = sub.add_parser("warm", help="Pre-populate the cache for every body image in a manifest")
+    warm.add_argument("manifest")
+    warm.add_argument("--api-key", default=os.environ.get("REMOVE_BG_API_KEY"))
+    warm.add_argument("-j", "--concurrency", type=int, default=4)
+
+    sub.add_parser("stats", help="Show cache size")
+    sub.add_parser("evict", help="Evict down to the size cap")
+
+    args = parser.parse_args(argv)
+    cache = CutoutCache(args.cache_dir, args.max_bytes)
+
+    if args.command == "stats":
+        print(json.dumps(cache.stats(), indent=2))
+        return 0
+    if args.command == "evict":
+        cache.evict()
+        print(json.dumps(cache.stats(), indent=2))
+        return 0
+
+    from removebg import RemoveBgClient
+
+    if not args.api_key:
+        parser.error("warm needs --api-key or REMOVE_BG_API_KEY")
+
+    images = manifest_images(read_manifest(args.manifest))
+    client = RemoveBgClient(args.api_key, max_concurrency=args.concurrency, cache=cache)
+    results = client.remove_many(images)
+    failed = [img for img, cutout in zip(images, results) if cutout is None]
+
+    print(f"Warmed {len(images) - len(failed)}/{len(images)} images "
+          f"({cache.hits} already cached, {len(failed)} failed)")
+    for img in failed:
+        print("  failed:", img)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+"""
+Encoding the finished flyer.
+
+The default PNG save of a multi-megapixel RGBA canvas is slow and far bigger
+than what social media targets need. export_image picks the encoder settings
+(PNG compress level, JPEG/WebP quality and method), flattens the alpha channel
+when asked or when the format has none, optionally quantises to a palette, and
+writes straight to a path, a file object or a socket. Every call reports the
+encode time and the number of bytes written.
+
+export_variants makes every channel size (print, Instagram, WhatsApp status,
+thumbnail...) from one master render: each size is resized from the nearest
+larger one already made, and the variants are encoded in parallel.
+
+    report = flyer.export("flyer.jpg", **PRESETS["whatsapp"])
+    for r in encode_report(flyer.background): print(r)
+    reports = flyer.export_variants("out/", ["instagram-square", "thumbnail"])
+"""
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from io import BytesIO
+import time
+import os
+
+
+# Named encoder settings (see export_image for the options)
+PRESETS = {
+    "png": {"format": "PNG", "compress_level": 6},                  # Pillow's default, lossless
+    "png-fast": {"format": "PNG", "compress_level": 1},             # lossless, much faster, a bit bigger
+    "png-palette": {"format": "PNG", "compress_level": 6, "quantize": 256},
+    "jpeg": {"format": "JPEG", "quality": 90, "optimize": True},
+    "whatsapp": {"format": "JPEG", "quality": 80, "optimize": True, "progressive": True},
+    "webp": {"format": "WEBP", "quality": 85, "method": 4},
+    "instagram": {"format": "JPEG", "quality": 85, "optimize": True},
+}
+
+# Named output sizes. fit "pad" shows the whole flyer on a canvas of the pad colour,
+# "crop" fills the size and cuts off what overflows (centered).
+VARIANTS = {
+    "print-a4": {"size": (2480, 3508), "fit": "pad", "preset": "png"},  # 300 dpi
+    "instagram-square": {"size": (1080, 1080), "fit": "pad", "preset": "instagram"},
+    "instagram-portrait": {"size": (1080, 1350), "fit": "pad", "preset": "instagram"},
+    "whatsapp-status": {"size": (1080, 1920), "fit": "pad", "preset": "whatsapp"},
+    "thumbnail": {"size": (400, 400), "fit": "crop", "preset": "jpeg"},
+}
+
+# Formats that cannot store an alpha channel
+NO_ALPHA = {"JPEG", "BMP"}
+# Formats that cannot store a palette image
+NO_PALETTE = {"JPEG"}
+
+
+def extension(format):
+    """File extension for a Pillow format name."""
+    return {"JPEG": "jpg"}.get(format.upper(), format.lower())
+
+
+class CountingWriter:
+    """
+    Pass-through writer that counts the bytes written (no fileno, so Pillow always goes through write).
+
+    tell and seek are passed through when the stream is seekable (formats like TIFF go back to patch
+    offsets), the count is then the extent of the output rather than the sum of the writes.
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+        self._written = 0
+        self._start = self._end = None
+        seekable = getattr(raw, "seekable", None)
+        if hasattr(raw, "seek") and hasattr(raw, "tell") and (seekable is None or seekable()):
+            self._start = self._end = raw.tell()
+            self.tell = raw.tell
+            self.seek = raw.seek
+
+    @property
+    def bytes(self):
+        return self._written if self._start is None else self._end - self._start
+
+    def write(self, data):
+        n = self.raw.write(data)
+        if self._start is None:
+            self._written += len(data)
+        else:
+            self._end = max(self._end, self.raw.tell())
+        return n
+
+    def flush(self):
+        flush = getattr(self.raw, "flush", None)
+        if flush is not None:
+            flush()
+
+
+class _NullSink:
+    def write(self, data):
+        return len(data)
+
+
+def flatten(img, colour="#FFFFFF"):
+    """Composite an image with alpha onto a solid colour (RGB result)."""
+    if "A" not in img.getbands() and "transparency" not in img.info:
+        return img if img.mode in ("RGB", "L") else img.convert("RGB")
+    img = img.convert("RGBA")
+    out = Image.new("RGB", img.size, colour)
+    out.paste(img, mask=img.getchannel("A"))
+    return out
+
+
+def prepare(img, format, flatten_colour=None, quantize=None):
+    """The image as it will be encoded: flattened and/or palette quantised."""
+    if flatten_colour is not None or format in NO_ALPHA:
+        img = flatten(img, flatten_colour or "#FFFFFF")
+    if quantize:
+        # Fast octree is the built-in method that also handles RGBA
+        method = Image.Quantize.FASTOCTREE if img.mode == "RGBA" else Image.Quantize.MEDIANCUT
+        img = img.quantize(colors=quantize, method=method)
+    return img
+
+
+def save_options(format, quality=None, compress_level=None, method=None, optimize=False, progressive=False):
+    """Keyword arguments for Image.save for one format."""
+    if format == "PNG":
+        return {"compress_level": 6 if compress_level is None else compress_level, "optimize": optimize}
+    if format == "JPEG":
+        return {"quality": 90 if quality is None else quality, "optimize": optimize, "progressive": progressive}
+    if format == "WEBP":
+        return {"quality": 85 if quality is None else quality, "method": 4 if method is None else method}
+    return {}
+
+
+def export_image(img, fp, format="PNG", quality=None, compress_level=None, method=None, flatten=None,
+                 quantize=None, optimize=False, progressive=False):
+    """
+    Encode img straight into fp.
+
+    Args:
+        img (PIL.Image): The image (e.g. Flyer.background).
+        fp: Path (str or os.PathLike), binary file-like object, or socket.
+        format (str): "PNG", "JPEG", "WEBP" (or any other Pillow format, formats that seek back
+            like TIFF need a seekable fp).
+        quality (int): JPEG/WebP quality.
+        compress_level (int): PNG zlib level, 0 (fastest) to 9 (smallest).
+        method (int): WebP effort, 0 (fastest) to 6 (smallest).
+        flatten (str/tuple): Colour to flatten the alpha channel onto. Formats without alpha
+            are always flattened (onto white by default).
+        quantize (int): Reduce to a palette of this many colours (not for JPEG).
+        optimize (bool): Extra encoder pass for smaller PNG/JPEG files.
+        progressive (bool): Progressive JPEG.
+
+    Returns:
+        dict: format, bytes written, encode seconds (including flattening/quantising) and the options used.
+    """
+    format = format.upper()
+    if format == "JPG":
+        format = "JPEG"
+    if quantize and format in NO_PALETTE:
+        raise ValueError(f"{format} cannot store a palette image, drop quantize or use PNG")
+    options = save_options(format, quality, compress_level, method, optimize, progressive)
+
+    t0 = time.perf_counter()
+    img = prepare(img, format, flatten, quantize)
+
+    close = None
+    if isinstance(fp, (str, os.PathLike)):
+        fp = close = open(fp, "wb")
+    elif hasattr(fp, "sendall") and not hasattr(fp, "write"):
+        fp = close = fp.makefile("wb")  # socket: stream through a buffered writer, the socket stays open
+
+    try:
+        writer = CountingWriter(fp)
+        img.save(writer, format=format, **options)
+        writer.flush()
+    finally:
+        if close is not None:
+            close.close()
+
+    return {
+        "format": format,
+        "bytes": writer.bytes,
+        "seconds": time.perf_counter() - t0,
+        "mode": img.mode,
+        "options": dict(options, flatten=flatten, quantize=quantize),
+    }
+
+
+def encode_report(img, presets=None):
+    """
+    Encode img with several presets without keeping the output.
+
+    Args:
+        presets (list): Names from PRESETS (default: all of them).
+
+    Returns:
+        list[dict]: One export_image report per preset, with its "preset" name.
+    """
+    reports = []
+    for name in presets or PRESETS:
+        report = export_image(img, _NullSink(), **PRESETS[name])
+        report["preset"] = name
+        reports.append(report)
+    return reports
+
+
+def variant_scale(size, target, fit="pad"):
+    """Scale of the master image in a variant of target size."""
+    scale_x, scale_y = target[0] / size[0], target[1] / size[1]
+    return min(scale_x, scale_y) if fit == "pad" else max(scale_x, scale_y)
+
+
+def place(img, target, fit="pad", pad="#FFFFFF"):
+    """
+    Put an image already scaled for a variant onto its final canvas.
+
+    Args:
+        img (PIL.Image): The master at variant_scale.
+        target (tuple): Variant size.
+        fit (str): "pad" centers img on a canvas of the pad colour, "crop" cuts it to target, centered.
+    """
+    w, h = target
+    if fit == "crop":
+        x, y = (img.width - w) // 2, (img.height - h) // 2
+        return img.crop((x, y, x + w, y + h))
+    canvas = Image.new("RGB", target, pad)
+    offset = ((w - img.width) // 2, (h - img.height) // 2)
+    canvas.paste(img, offset, img if img.mode == "RGBA" else None)
+    return canvas
+
+
+def export_variants(img, variants=None, out=None, basename="flyer", pad="#FFFFFF", workers=None):
+    """
+    Make several output sizes of one master image and encode them in parallel.
+
+    The variants are made from the largest to the smallest, each one resized from the
+    previous (the nearest larger intermediate) instead of from the master, so a 400 px
+    thumbnail costs a resize of a ~1000 px image rather than of the full flyer.
+
+    Args:
+        img (PIL.Image): The master render (e.g. Flyer.background).
+        variants (list): Names from VARIANTS, or dicts with "name", "size", "fit" and "preset"
+            (default: every entry of VARIANTS).
+        out (str): Directory the variants are written to as basename_name.ext. None keeps them
+            in memory, in each report's "data".
+        pad (str/tuple): Canvas colour of "pad" variants.
+        workers (int): Encoder threads (default: one per variant, up to the CPU count).
+
+    Returns:
+        list[dict]: export_image reports in the order of variants, with "name", "size",
+        "resize_seconds" and "path" (or "data").
+    """
+    specs = []
+    for variant in variants or list(VARIANTS):
+        spec = dict(VARIANTS[variant], name=variant) if isinstance(variant, str) else dict(variant)
+        spec["scale"] = variant_scale(img.size, spec["size"], spec.get("fit", "pad"))
+        specs.append(spec)
+    if out is not None:
+        os.makedirs(out, exist_ok=True)
+
+    def encode(spec, canvas):
+        options = PRESETS[spec["preset"]]
+        if out is None:
+            buf = BytesIO()
+            report = export_image(canvas, buf, **options)
+            report["data"] = buf.getvalue()
+        else:
+            path = os.path.join(out, f"{basename}_{spec['name']}.{extension(options['format'])}")
+            report = export_image(canvas, path, **options)
+            report["path"] = path
+        return report
+
+    reports = {}
+    workers = workers or min(len(specs), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        # Resize cascade, largest first; encoding of each variant starts as soon as it is ready
+        current, current_scale = img, 1.0
+        futures = []
+        for idx in sorted(range(len(specs)), key=lambda idx: -specs[idx]["scale"]):
+            spec = specs[idx]
+            t0 = time.perf_counter()
+            size = (max(1, round(img.width * spec["scale"])), max(1, round(img.height * spec["scale"])))
+            if spec["scale"] < current_scale:
+                current = current.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+                current_scale = spec["scale"]
+                scaled = current
+            elif current.size == size:
+                scaled = current
+            else:  # upscaling, always from the master
+                scaled = img.resize(size, Image.Resampling.LANCZOS)
+            canvas = place(scaled, spec["size"], spec.get("fit", "pad"), pad)
+            resize_seconds = time.perf_counter() - t0
+            futures.append((idx, resize_seconds, pool.submit(encode, spec, canvas)))
+
+        for idx, resize_seconds, future in futures:
+            report = future.result()
+            report.update(name=specs[idx]["name"], size=specs[idx]["size"], resize_seconds=resize_seconds)
+            reports[idx] = report
+    return [reports[idx] for idx in range(len(specs))]
+
+
+if __name__ == "__main__":
+    import sys
+
+    source = Image.open(sys.argv[1])
+    source.load()
+    print(f"{'preset':<13}{'format':<7}{'ms':>9}{'KB':>10}")
+    for r in encode_report(source, sys.argv[2:] or None):
+        print(f"{r['preset']:<13}{r['format']:<7}{r['seconds'] * 1000:>9.1f}{r['bytes'] / 1024:>10.0f}")
@@ -1,82 +1,243 @@
-from PIL import Image, ImageDraw, ImageFont, ImageOps
-import requests
-from io import BytesIO
+from PIL import Image, ImageDraw, ImageOps
+from font_registry import get_font, font_registry
+from text_cache import text_cache
+from text_layout import wrap_lines, lines_height
+from assets import open_image, open_bounded, source_name, has_transparency, has_soft_alpha, LazyImage, loaded
+from asset_store import spill
+from removebg import shared_client
+from local_bg import LocalBgRemover
+import layout
+import export
+from tracing import traced
+import collections
+import os
+
+
+# Resampling per quality tier: (resizing body images / background, ImageOps.contain for icons and logo)
+QUALITY_TIERS = {
+    "final": (Image.Resampling.LANCZOS, Image.Resampling.BICUBIC),
+    "preview": (Image.Resampling.BILINEAR, Image.Resampling.BILINEAR),
+    "draft": (Image.Resampling.NEAREST, Image.Resampling.NEAREST),
+}
+
+
+# Part of every asset store key: bump when prepare_body/prepare_icon/prepare_logo change their output
+PREPARE_VERSION = 3
+
+
+def body_slot(face, part):
+    """Key of Flyer.body_imgs a body image goes to."""
+    if part == "main" and face == 'front':
+        return 'main_front'
+    if part == "main" and face == 'back':
+        return 'main_back'
+    return 'other'
 
 
 ### Set the text background box width to be dynamic
 class Flyer:
+    # Images resized on the executor ahead of the one being pasted (paste_group)
+    paste_ahead = 2
+
     def __init__(self, bg_name, title_font, title_font_size, title_font_fill, body_font, body_font_size, body_font_fill,
                  subheader_font, subheader_font_size, subheader_font_fill, subheader_desc_font, subheader_desc_font_size,
-                 subheader_desc_font_fill, flyer_type="phone", vertical=False, remove_bg_api_key=None):  # Default to "phone" flyer type
-        self.background = Image.open(bg_name)
+                 subheader_desc_font_fill, flyer_type="phone", vertical=False, remove_bg_api_key=None,
+                 remove_bg_client=None, bg_removal=None, scale=1.0, quality="final",
+                 asset_store=None, tracer=None, flyer_layout=None, lazy_assets=False, executor=None,
+                 fit_text=False):  # Default to "phone" flyer type
+        # scale < 1 renders everything proportionally smaller (fast previews),
+        # quality picks the resampling filters ("final", "preview" or "draft")
+        self.scale = scale
+        self.quality = quality
+        self.resample, self.contain_resample = QUALITY_TIERS[quality]
+        # Positions and boxes, from a compiled template file (template_spec.py) or the built-in defaults
+        flyer_layout = flyer_layout or layout.DEFAULT_LAYOUT
+        self.geometry = flyer_layout.geometry.scaled(scale)
+        # Optional tracing.Tracer: span timings and counters of every stage
+        self.tracer = tracer
+
+        self.bg_source = bg_name
+        self.background = self.load_background(bg_name)
         self.footer_img_list = {}
         self.body_imgs = {}
         self.title_font = title_font
-        self.title_font_size = title_font_size
+        self.title_font_size = self.scaled(title_font_size)
         self.title_font_fill = title_font_fill
         self.body_font = body_font
-        self.body_font_size = body_font_size
+        self.body_font_size = self.scaled(body_font_size)
         self.body_font_fill = body_font_fill
         self.subheader_font = subheader_font
         self.subheader_font_fill = subheader_font_fill
-        self.subheader_font_size = subheader_font_size
+        self.subheader_font_size = self.scaled(subheader_font_size)
         self.subheader_desc_font = subheader_desc_font
-        self.subheader_desc_font_size = subheader_desc_font_size
+        self.subheader_desc_font_size = self.scaled(subheader_desc_font_size)
         self.subheader_desc_font_fill = subheader_desc_font_fill
         self.flyer_type = flyer_type  
-        self.start_x = 700
-        self.right_margin = 200
-        self.start_y = 1600
-        self.bottom_margin = 800
-        self.spacing_btw = 50
+        body = flyer_layout.body.scaled(scale)
+        self.start_x = body.start_x
+        self.right_margin = body.right_margin
+        self.start_y = body.start_y
+        self.bottom_margin = body.bottom_margin
+        self.spacing_btw = body.spacing_btw
         self.side_is_vertical = vertical
         self.remove_bg_api_key = remove_bg_api_key
+        # bg_removal: None (off), "removebg" (API, default when a key is given) or "local" (offline)
+        self.bg_removal = bg_removal or ("removebg" if remove_bg_api_key else None)
+        # Pass a client to use instead of the process-wide one for the API key (removebg.shared_client)
+        self.remove_bg_client = remove_bg_client
+        if self.remove_bg_client is None:
+            if self.bg_removal == "local":
+                self.remove_bg_client = LocalBgRemover()
+            elif self.bg_removal == "removebg" and remove_bg_api_key:
+                self.remove_bg_client = shared_client(remove_bg_api_key)
+        # When set (see layers.py), pastes are recorded into this list instead of drawn
+        self.layer = None
+        # Optional AssetStore: trimmed/fitted assets are reused across flyers and processes
+        self.asset_store = asset_store
+        # Keep body images and footer icons as LazyImage handles, memory-mapped again when pasted
+        # (bounds memory on many-image flyers, from the asset store or a temporary file)
+        self.lazy_assets = lazy_assets
+        # Optional concurrent.futures executor (threads): independent assets are decoded, trimmed
+        # and resized on it, pasting stays in the same order so the output is identical
+        self.executor = executor
+        # Shrink title, subtitle and footer texts that would overflow their boxes (geometry widths and heights),
+        # the font sizes above become maximums
+        self.fit_text = fit_text
+
+
+    @traced
+    def load_background(self, bg_name):
+        """
+        Open the flyer background. bg_name can be a path, bytes, a file-like object
+        or a PIL image. PIL images (e.g. a FlyerTemplate background) are copied, since we draw on them.
+        """
+        background = open_image(bg_name)
+        if self.scale != 1:
+            factor = 1 / self.scale
+            if self.quality != "final" and factor.is_integer():
+                return background.reduce(int(factor))  # box filter, much faster than resize
+            size = (self.scaled(background.width), self.scaled(background.height))
+            self.count_resize(background)
+            return background.resize(size, self.resample, reducing_gap=2.0)
+        if background is bg_name:
+            background = bg_name.copy()
+        return background
+
+
+    def count_resize(self, img):
+        """Count a resize of img (source pixels) when tracing."""
+        if self.tracer is not None:
+            self.tracer.count("resize_calls")
+            self.tracer.count("pixels_resized", img.width * img.height)
+
+
+    def font(self, path, size):
+        """Font from the shared registry, counting the ones actually loaded when tracing."""
+        if self.tracer is None:
+            return get_font(path, size)
+        misses = font_registry.misses
+        font = get_font(path, size)
+        self.tracer.count("fonts_loaded", font_registry.misses - misses)
+        return font
+
+
+    def scaled(self, value):
+        """A pixel value of the full size flyer at this flyer's scale."""
+        return layout.scale_value(value, self.scale)
+
+
+    def reset(self):
+        """
+        Get ready for the next product: fresh copy of the background, no body or footer images.
+        Fonts and layout constants are kept.
+        """
+        self.background = self.load_background(self.bg_source)
+        self.footer_img_list = {}
+        self.body_imgs = {}
+
+
+    def paste_on_background(self, img, position, mask=None):
+        """Paste onto the background, or record the paste when rendering into a layer."""
+        if self.layer is not None:
+            self.layer.append((img, position, mask))
+        else:
+            self.background.paste(img, position, mask)
 
 
+    def _is_background(self, img_path):
+        return img_path is self.bg_source or (isinstance(img_path, str) and img_path == self.bg_source)
 
+
+    @traced
     def remove_bg_from_image(self, img_path):
         """
         This function removes the background of the image by calling the remove.bg API.
         
         Args:
-            img_path (str): Path to the image from which the background should be removed.
+            img_path: Path, bytes, file-like object or PIL image from which the background should be removed.
         
         Returns:
             PIL.Image: Image with the background removed.
         """
-        with open(img_path, 'rb') as f:
-            r = requests.post(
-                "https://api.remove.bg/v1.0/removebg",
-                headers={"X-Api-Key": self.remove_bg_api_key},
-                files={"image_file": f},
-                data={"size": "auto"},
-                timeout=60
-            )
-            
-            if r.status_code == requests.codes.ok:
-                # Return the image after removing the background
-                img = Image.open(BytesIO(r.content)).convert("RGBA")
-                return img
-            else:
-                print("Error:", r.status_code, r.text)
-                return None
-            
+        return self.remove_bg_client.remove(img_path)
+
+    @traced
     def process_and_remove_bg(self, img_path):
         """
         Process an image (excluding flyer background) and remove its background.
         
         Args:
-            img_path (str): Path to the image to process.
+            img_path: Path, bytes, file-like object or PIL image to process.
         
         Returns:
             PIL.Image: Processed image with the background removed.
         """
-        if img_path != self.background.filename:  # Avoid removing the background of the flyer itself
+        if not self._is_background(img_path):  # Avoid removing the background of the flyer itself
             return self.remove_bg_from_image(img_path)
-        return Image.open(img_path)
+        return open_image(img_path)
+
+
+    @traced
+    def process_and_remove_bg_many(self, img_paths):
+        """
+        Remove the background of several images concurrently (e.g. all body images of a flyer).
+        
+        Args:
+            img_paths (list): Paths, bytes, file-like objects or PIL images.
+        
+        Returns:
+            list: Processed images in the same order as img_paths (None where removal failed).
+        """
+        img_paths = list(img_paths)
+        results = [None] * len(img_paths)
+        to_remove = []
+        for idx, img_path in enumerate(img_paths):
+            if self._is_background(img_path):
+                results[idx] = open_image(img_path)
+            else:
+                to_remove.append(idx)
+
+        cutouts = self.remove_bg_client.remove_many([img_paths[idx] for idx in to_remove])
+        for idx, cutout in zip(to_remove, cutouts):
+            results[idx] = cutout
+        return results
 
 
     def draw_wrapped_text(self, text, font_name, font_size, font_fill, box_width, box_height=400, line_spacing=0, center=True):
+        """
+        Wrapped text block as an RGBA image, memoised in the shared text_cache
+        (the returned image may be shared, paste it but do not draw on it).
+
+        Returns:
+            tuple: (image, number of lines)
+        """
+        key = (text, os.path.normpath(font_name), font_size, font_fill, box_width, line_spacing, center)
+        return text_cache.get(key, lambda: self.rasterise_text(text, font_name, font_size, font_fill, box_width,
+                                                               line_spacing, center))
+
+
+    @traced
+    def rasterise_text(self, text, font_name, font_size, font_fill, box_width, line_spacing=0, center=True):
         
         """
         Draws wrapped text inside a defined box width on a given image.
@@ -91,138 +252,169 @@ class Flyer:
             line_spacing (int): Extra spacing between lines.
         """
 
-        font = ImageFont.truetype(font_name, font_size)
-
-        # --- STEP 1: Prepare temporary image for measuring ---
-        temp_img = Image.new("RGBA", (box_width, 1000))  # big temp height
-        draw = ImageDraw.Draw(temp_img)
+        font = self.font(font_name, font_size)
 
-        # ---------- WORD WRAPPING (your same code) -------------
-        words = text.split()
-        lines = []
-        line = ""
-
-        for word in words:
-            test_line = line + " " + word if line else word
-            line_width = draw.textlength(test_line, font=font)
-
-            if line_width <= box_width:
-                line = test_line
-            else:
-                if line:
-                    lines.append(line)
-                line = word
-
-        if line:
-            lines.append(line)
-        # ---------------------------------------------------------
+        # --- STEP 1: Word wrapping (each word is measured once per font) ---
+        lines = wrap_lines(text, font, box_width)
 
         # --- STEP 2: Measure total needed height ---
-        total_height = 0
-        for line in lines:
-            _, _, _, h = font.getbbox(line)
-            total_height += h + line_spacing
+        total_height = lines_height(lines, line_spacing)
 
-        total_height = total_height - line_spacing   # remove last extra spacing
-
-        # If user passed a box_height smaller than needed, overwrite it
         box_height = max(total_height, 1)
 
         # --- STEP 3: Create final image using dynamic height ---
         inner_img = Image.new("RGBA", (box_width, box_height), (0, 0, 0, 0))
         draw = ImageDraw.Draw(inner_img)
 
-        # --- STEP 4: Draw text normally (your same logic) ---
+        # --- STEP 4: Draw text, reusing the line metrics from the measure pass ---
         y = 0
         for line in lines:
-            line_width = draw.textlength(line, font=font)
-            x = (box_width - line_width) // 2 if center else 0
-            draw.text((x, y), line, font=font, fill=font_fill)
-            _, _, _, h = font.getbbox(line)
-            y += h + line_spacing
+            x = (box_width - line.width) // 2 if center else 0
+            draw.text((x, y), line.text, font=font, fill=font_fill)
+            y += line.bottom + line_spacing
 
         return inner_img, len(lines)
 
 
 
+    def text_size(self, text, font_name, font_size, box_width, box_height):
+        """
+        Font size to draw text at: font_size, or with fit_text the largest size up to
+        font_size whose wrapped text fits box_width x box_height (layout.fit_font_size).
+        """
+        if not self.fit_text or not text:
+            return font_size
+        return layout.fit_font_size(text, font_name, font_size, box_width, box_height)
+
+
+    def title_size(self, title):
+        return self.text_size(title, self.title_font, self.title_font_size,
+                              self.geometry.title_box_width, self.geometry.title_box_height)
+
+
+    def subtitle_sizes(self, subtitle, subtitle_description):
+        """Font sizes of the subheader and its description."""
+        geo = self.geometry
+        return (self.text_size(subtitle, self.subheader_font, self.subheader_font_size,
+                               geo.subheader_box_width, geo.subheader_box_height),
+                self.text_size(subtitle_description, self.subheader_desc_font, self.subheader_desc_font_size,
+                               geo.subheader_desc_box_width, geo.subheader_box_height))
+
+
+    @traced
     def create_title(self, title):
 
-        # box_height = 550
         # Create text image
         header, _ = self.draw_wrapped_text(
             text=title,
-            box_width=2500,
-            font_size=self.title_font_size,
+            box_width=self.geometry.title_box_width,
+            font_size=self.title_size(title),
             font_name=self.title_font,
             font_fill = self.title_font_fill,
             center=False
         ) 
 
-        # Convert to RGBA so we can paste transparently
-        header = header.convert("RGBA")
-
         # Paste the title onto the background
-        self.background.paste(header, (800, 800), header)
+        box = layout.title_box(header.size, self.geometry)
+        self.paste_on_background(header, (box.x, box.y), header)
 
         self.title_height = header.height
 
-    
-    def create_subtitle(self, subtitle, subtitle_description):
-
-        # FONT OBJECTS
-        font_big = ImageFont.truetype(self.subheader_font, self.subheader_font_size)
-        font_small = ImageFont.truetype(self.subheader_desc_font, self.subheader_desc_font_size)
 
+    def subtitle_baseline_offset(self, subheader_size=None, desc_size=None):
         # ASCENT DIFFERENCE FOR BASELINE ALIGNMENT
-        ascent_big, _ = font_big.getmetrics()
-        ascent_small, _ = font_small.getmetrics()
-        baseline_offset = ascent_big - ascent_small
+        ascent_big, _ = self.font(self.subheader_font, subheader_size or self.subheader_font_size).getmetrics()
+        ascent_small, _ = self.font(self.subheader_desc_font, desc_size or self.subheader_desc_font_size).getmetrics()
+        return ascent_big - ascent_small
+
+    
+    @traced
+    def create_subtitle(self, subtitle, subtitle_description):
+        subheader_size, desc_size = self.subtitle_sizes(subtitle, subtitle_description)
 
         # --- LEFT SUBHEADER ---
         subheader_img, subheader_lines = self.draw_wrapped_text(
             text=subtitle,
-            box_width=600,
+            box_width=self.geometry.subheader_box_width,
             box_height=200,
-            font_size=self.subheader_font_size,
+            font_size=subheader_size,
             font_name=self.subheader_font,
             font_fill=self.subheader_font_fill,
             center=False
         ) # text, font_name, font_size, font_fill, box_width
-        subheader_img = subheader_img.convert("RGBA")
-
-        # Subheader top Y
-        subheader_y = 800 + self.title_height + 60
-
-        # Paste LEFT text
-        self.background.paste(subheader_img, (800, subheader_y), subheader_img)
 
         # --- RIGHT DESCRIPTION ---
         desc_img, desc_lines = self.draw_wrapped_text(
             text=subtitle_description,
-            box_width=2000,
+            box_width=self.geometry.subheader_desc_box_width,
             box_height=200,
-            font_size=self.subheader_desc_font_size,
+            font_size=desc_size,
             font_name=self.subheader_desc_font,
             font_fill = self.subheader_desc_font_fill,
             center=False
         )
-        desc_img = desc_img.convert("RGBA")
 
-        # Default Y = align to TOP
-        desc_y = subheader_y
+        # Subheader below the title, description baseline aligned when it is one line
+        subheader_box, desc_box = layout.subtitle_boxes(
+            self.title_height, subheader_img.size, desc_img.size, desc_lines,
+            self.subtitle_baseline_offset(subheader_size, desc_size), self.geometry
+        )
 
-        # If description is one line → align baseline
-        if desc_lines == 1:
-            desc_y = subheader_y + baseline_offset
+        # Paste LEFT text
+        self.paste_on_background(subheader_img, (subheader_box.x, subheader_box.y), subheader_img)
 
         # Paste RIGHT text
-        self.background.paste(
-            desc_img,
-            (800 + subheader_img.width + 20, desc_y),
-            desc_img
+        self.paste_on_background(desc_img, (desc_box.x, desc_box.y), desc_img)
+
+
+    @traced
+    def plan_layout(self, title="", subtitle="", subtitle_description="", columns=True, logo_size=None):
+        """
+        Compute the final box of every element from image sizes and font metrics only,
+        nothing is resized or drawn. Body and footer images must already be fitted.
+
+        Args:
+            title, subtitle, subtitle_description (str): Texts as passed to create_title/create_subtitle.
+            columns (bool): Two-column body layout.
+            logo_size (tuple): Size of the trimmed logo, if there is one.
+
+        Returns:
+            dict: "canvas" size plus a layout.Box or layout.Group per element.
+        """
+        plan = {"canvas": self.background.size}
+        if logo_size:
+            plan["logo"] = layout.logo_box(logo_size, self.geometry)
+
+        title_w, title_h, _ = layout.text_block(title, self.title_font, self.title_size(title),
+                                                self.geometry.title_box_width)
+        plan["title"] = layout.title_box((title_w, title_h), self.geometry)
+
+        subheader_size, desc_size = self.subtitle_sizes(subtitle, subtitle_description)
+        sub_w, sub_h, _ = layout.text_block(subtitle, self.subheader_font, subheader_size,
+                                            self.geometry.subheader_box_width)
+        desc_w, desc_h, desc_lines = layout.text_block(subtitle_description, self.subheader_desc_font,
+                                                       desc_size, self.geometry.subheader_desc_box_width)
+        plan["subheader"], plan["subheader_desc"] = layout.subtitle_boxes(
+            title_h, (sub_w, sub_h), (desc_w, desc_h), desc_lines,
+            self.subtitle_baseline_offset(subheader_size, desc_size), self.geometry
         )
 
+        plan["main"], side = self.layout_body(columns)
+        if side is not None:
+            plan["side"] = side
+
+        footer = self.layout_footer()
+        if footer is not None:
+            plan["footer"] = footer
+        return plan
 
+
+    def check_layout(self, *args, **kwargs):
+        """Plan the flyer (same arguments as plan_layout) and return the list of layout problems."""
+        return layout.check_layout(self.plan_layout(*args, **kwargs))
+
+
+    @traced
     def create_body(self, column):
         if self.flyer_type == "laptop":
             self.create_laptop_body(column)
@@ -243,242 +435,235 @@ class Flyer:
         Returns:
             PIL.Image: Scaled image.
         """
-        # Current size
-        w, h = img.size
+        return self.resize_to(img, layout.scale_up_size(img.size, target_width, target_height))
 
-        # Compute scale factor to enlarge proportionally
-        scale_w = target_width / w
-        scale_h = target_height / h
 
-        # Use the smaller scale to fit within the target box
-        scale_factor = min(scale_w, scale_h)
-
-        # Only scale up (ignore if image is already bigger than target)
-        if scale_factor > 1:
-            new_w = int(w * scale_factor)
-            new_h = int(h * scale_factor)
-            img = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
-        
+    def resize_to(self, img, size):
+        """Resize img to the size the layout planned for it (no-op if it already has that size)."""
+        if img.size != tuple(size):
+            self.count_resize(img)
+            img = img.resize(tuple(size), self.resample)
         return img
     
 
-    def fit_body(self, body_img_name, face=None, part=None):
-        # Process body image to remove its background
-        bd_img = Image.open(body_img_name)       
-        bbox = bd_img.getbbox()
-        bd_img = bd_img.crop(bbox)
-        # max_size = (1900, 1900)
-        # bd_img = ImageOps.contain(bd_img, max_size)
-        
-        if (part == "main") and (face == 'front'):
-            self.body_imgs.setdefault('main_front', []).append(bd_img) 
-        elif (part == "main") and (face == 'back'):
-            self.body_imgs.setdefault('main_back', []).append(bd_img) 
-        else:
-            self.body_imgs.setdefault('other', []).append(bd_img) 
+    def body_max_size(self):
+        """Largest box a body image can be laid out in (the whole body area)."""
+        return layout.body_area(self.background.size, self.start_x, self.start_y,
+                                self.right_margin, self.bottom_margin, columns=False)
 
 
+    def _prepared(self, source, params, prepare):
+        # prepare() result, through the asset store when there is one
+        img = self._prepare(source, params, prepare)
+        if not self.lazy_assets or isinstance(source, Image.Image):
+            return img  # an in-memory source (e.g. a remove.bg cutout) is held anyway
+        # Only the size is kept, the pixels are freed here and mapped back from the store
+        # (or from a temporary file without one) when pasted, never decoded twice
+        reopen = spill(img) if self.asset_store is None else lambda: self._prepare(source, params, prepare)
+        return LazyImage(source, img.size, img.mode, reopen)
 
-    def create_phone_body(self, columns):
-        """Phone flyer body. Supports full-width mode and 2-column layout."""
-
-        image_body = self.body_imgs
-
-        back_imgs = image_body.get('main_back', [])
-        front_imgs = image_body.get('main_front', [])
-        other_imgs = image_body.get('other', [])
 
-      
-        # BASE DIMENSIONS
-        total_width = self.background.width - (self.start_x + self.right_margin)
-        use_height = self.background.height - (self.start_y + self.bottom_margin)
+    def _prepare(self, source, params, prepare):
+        if self.asset_store is None:
+            return prepare()
+        return self.asset_store.fetch(source, params, prepare)
 
-        
-        # COLUMN LOGIC
-        if columns:
-            left_width = 2 * total_width // 3
-           
-        else:
-            left_width = total_width
-          
 
+    def _task(self, fn):
+        # fn for the executor, its spans nested under the caller's (not separate stages)
+        return fn if self.tracer is None else self.tracer.propagate(fn)
 
-        # Scale images proportionally
-        scaled_imgs_front = []
-        scaled_imgs_back = []
-        total_img_width = 0
-        max_img_height = 0
-        for img in front_imgs:
-            img_scaled = self.scale_image_up(img, left_width // max(1, len(front_imgs)), use_height)
-            scaled_imgs_front.append(img_scaled)
-            total_img_width += img_scaled.width
-            max_img_height = max(max_img_height, img_scaled.height)
 
-        for img in back_imgs:
-            img_scaled = self.scale_image_up(img, left_width // max(1, len(back_imgs)), use_height)
-            scaled_imgs_back.append(img_scaled)
-            total_img_width += img_scaled.width//2
-            max_img_height = max(max_img_height, img_scaled.height)
+    def _map(self, fn, items):
+        # [fn(item) for item in items], on the executor when there is one
+        if self.executor is None:
+            return [fn(item) for item in items]
+        return list(self.executor.map(self._task(fn), items))
 
 
-        # Create composite canvas just big enough for images
-        composite_main = Image.new("RGBA", (total_img_width, max_img_height), (0, 0, 0, 0))
+    @traced
+    def fit_body(self, body_img_name, face=None, part=None):
+        self.body_imgs.setdefault(body_slot(face, part), []).append(self._fitted_body(body_img_name))
 
 
-        # Paste images horizontally
-        past_dist = 0
-        for img in scaled_imgs_back:
-            composite_main.paste(img, (past_dist, 0), img)
-            past_dist += img.width//2
-        
-        
-        for img in scaled_imgs_front:
-            composite_main.paste(img, (past_dist, 0), img)
-            past_dist += img.width
+    @traced
+    def fit_body_many(self, items):
+        """
+        fit_body for several images, prepared concurrently on the executor.
 
-        
-        # Horizontal centering
-        if columns:
-            x_center = self.start_x + (left_width - composite_main.width) // 2
+        Args:
+            items (list): (image source, face, part) tuples, added in this order.
+        """
+        items = list(items)
+        for bd_img, (_, face, part) in zip(self._map(lambda item: self._fitted_body(item[0]), items), items):
+            self.body_imgs.setdefault(body_slot(face, part), []).append(bd_img)
+
+
+    def _fitted_body(self, body_img_name):
+        removal = self.remove_bg_client.params() if self.bg_removal == "local" else None
+        params = {"op": "body", "max_size": list(self.body_max_size()), "removal": removal, "v": PREPARE_VERSION}
+        return self._prepared(body_img_name, params, lambda: self.prepare_body(body_img_name))
+
+
+    def prepare_body(self, body_img_name):
+        """Decode, (locally) remove the background and trim a body image. Returns it as RGBA."""
+        # Decode no bigger than the body area needs (a 48 MP photo is not decoded at full size)
+        if self.bg_removal == "local":
+            # The subject is only known after removal, keep resolution for trimming the whole frame later
+            bd_img = open_bounded(body_img_name, self.body_max_size(), oversample=2)
+            # Local removal is cheap, so do it here for images that have no transparency yet (e.g. JPEG)
+            if not has_transparency(bd_img):
+                bd_img = self.remove_bg_client.remove_background(bd_img)
+            bd_img = bd_img.crop(bd_img.getbbox())
         else:
-            x_center = (self.background.width - composite_main.width) // 2
-
-        # Vertical centering
-        y_center = self.start_y + max(0, (use_height - composite_main.height) // 2)
+            bd_img = open_bounded(body_img_name, self.body_max_size(), trim=True)
+        # the layout fits it to its box, up or down
+        # max_size = (1900, 1900)
+        # bd_img = ImageOps.contain(bd_img, max_size)
+        return bd_img if bd_img.mode == "RGBA" else bd_img.convert("RGBA")
 
-        self.background.paste(composite_main, (x_center, y_center), composite_main)
 
-        # Handle side images
-        if columns:
-            right_x = self.start_x + left_width
-            fake_main = Image.new("RGBA", (0, composite_main.height), (0, 0, 0, 0))
-            self.create_side_images(other_imgs, right_x, self.start_y, fake_main)
 
+    def layout_body(self, columns):
+        """
+        Plan the main and side images from their sizes only (see layout.py).
 
-    def create_laptop_body(self, columns):
-        """Laptop flyer body with proper vertical centering."""
+        Returns:
+            tuple: (main Group, side Group or None)
+        """
         image_body = self.body_imgs
         front_imgs = image_body.get('main_front', [])
+        # Laptop flyers only show front views
+        back_imgs = image_body.get('main_back', []) if self.flyer_type != "laptop" else []
         other_imgs = image_body.get('other', [])
 
-        # start_x = 700
-        # right_margin = 200
-        total_width = self.background.width - self.start_x -self.right_margin
-
-        # start_y = 1700
-        # bottom_margin = 750
-        use_height = self.background.height - self.start_y - self.bottom_margin
-
-        # Column logic
-        left_width = 2 * total_width // 3 if columns else total_width
-
-        # Scale images proportionally
-        scaled_imgs = []
-        total_img_width = 0
-        max_img_height = 0
-        for img in front_imgs:
-            img_scaled = self.scale_image_up(img, left_width // max(1, len(front_imgs)), use_height)
-            scaled_imgs.append(img_scaled)
-            total_img_width += img_scaled.width
-            max_img_height = max(max_img_height, img_scaled.height)
-
-        # Create composite canvas just big enough for images
-        composite_main = Image.new("RGBA", (total_img_width, max_img_height), (0, 0, 0, 0))
-
-        # Paste images horizontally
-        past_dist = 0
-        for img in scaled_imgs:
-            composite_main.paste(img, (past_dist, 0), img)
-            past_dist += img.width
-
-        # Horizontal centering
-        if columns:
-            x_center = self.start_x + (left_width - composite_main.width) // 2
-        else:
-            x_center = (self.background.width - composite_main.width) // 2
-
-        # Vertical centering
-        y_center = self.start_y + max(0, (use_height - composite_main.height) // 2)
-
-        self.background.paste(composite_main, (x_center, y_center), composite_main)
+        main = layout.main_body(
+            [img.size for img in front_imgs], [img.size for img in back_imgs], self.background.size,
+            self.start_x, self.start_y, self.right_margin, self.bottom_margin, columns
+        )
 
-        # Handle side images
+        side = None
         if columns:
-            right_x = self.start_x + left_width
-            fake_main = Image.new("RGBA", (0, composite_main.height), (0, 0, 0, 0))
-            self.create_side_images(other_imgs, right_x, self.start_y, fake_main)
-          
-
-    def create_side_images(self, other_imgs, right_x, start_y, composite_main):
-        """
-        Handle the optional side/extra images, ensuring proper alignment, resizing,
-        and vertical centering inside the remaining space to the right of the main body.
-        """
+            left_width, _ = layout.body_area(self.background.size, self.start_x, self.start_y,
+                                             self.right_margin, self.bottom_margin, columns)
+            side = self.layout_side_images(other_imgs, self.start_x + left_width, self.start_y, 0)
+        return main, side
 
-       
-        # 1) Compute remaining horizontal region (to the right of main)
-        remaining_start = right_x + composite_main.width + self.spacing_btw
-        remaining_end = self.background.width - self.right_margin
-        remaining_width = max(0, remaining_end - remaining_start)
 
-        # 2) Compute usable vertical region
-        usable_top = start_y
-        usable_bottom = self.background.height - self.bottom_margin
-        usable_height = max(0, usable_bottom - usable_top)
+    def layout_side_images(self, other_imgs, right_x, start_y, main_width):
+        return layout.side_images(
+            [img.size for img in other_imgs], right_x, start_y, main_width, self.background.size,
+            self.right_margin, self.bottom_margin, self.spacing_btw, self.side_is_vertical, self.geometry
+        )
 
-        # 3) Determine composite height for side images (vertical stack)
-        num_imgs = len(other_imgs)
-        if num_imgs == 0:
-            return  # nothing to do
 
-        # Compute total height with spacing
-        # spacing_between_imgs = 200
-        total_img_height = 0
-        scaled_imgs = []
+    def main_images(self):
+        """Main body images in paste order: back views (phone only) then front views."""
+        front_imgs = self.body_imgs.get('main_front', [])
+        if self.flyer_type == "laptop":
+            return front_imgs
+        return self.body_imgs.get('main_back', []) + front_imgs
 
-        adj_dist = self.spacing_btw * len(other_imgs)+100
 
-        for img in other_imgs:
-            if self.side_is_vertical:
-                img = self.scale_image_up(img, (remaining_width-adj_dist), (usable_height-adj_dist)//max(1, len(other_imgs)))
-            else:
-                img = self.scale_image_up(img, ((remaining_width-adj_dist)//max(1, len(other_imgs))), (usable_height-adj_dist))
-            scaled_imgs.append(img)
-            total_img_height += img.height + self.spacing_btw
+    @traced
+    def paste_group(self, group, imgs):
+        """
+        Resize imgs to their planned boxes and paste them straight onto the background.
 
-        # total_img_height -= spacing_between_imgs  # remove last extra spacing
+        The pixels are the same as building a transparent composite of the whole group and
+        pasting that, without allocating it. An image with hard edges (alpha only 0 or 255)
+        is pasted as is. Images that overlap each other or have soft edges go through a
+        buffer the size of their own boxes, so they blend exactly as in the group composite.
+        """
+        visible = []
+        for img, box in zip(imgs, group.items):
+            clip = box.clip(group.box)  # the group composite cut off anything outside its box
+            if clip is not None:
+                visible.append((img, box, clip))
+
+        clusters = layout.overlap_clusters([clip for _, _, clip in visible])
+        stream = self._resized_in_order([visible[idx] for cluster in clusters for idx in cluster])
+        for cluster in clusters:
+            # Resized one at a time (a few ahead with an executor), only the buffer lives for the whole cluster
+            pieces = (next(stream) for _ in cluster)
+            if len(cluster) == 1:
+                img, clip = next(pieces)
+                if img.mode == "RGBA" and not has_soft_alpha(img):
+                    self.paste_on_background(img, (clip.x, clip.y), img)
+                    del img  # freed before the next image is decoded
+                    continue
+                pieces = iter([(img, clip)])
+                del img
+
+            area = layout.union([visible[idx][2] for idx in cluster])
+            buffer = Image.new("RGBA", area.size, (0, 0, 0, 0))
+            for img, clip in pieces:
+                buffer.paste(img, clip.offset(area), img)
+                del img
+            self.paste_on_background(buffer, (area.x, area.y), buffer)
+
+
+    def _resized_in_order(self, items):
+        # _clipped of every (img, box, clip), in order. With an executor, at most paste_ahead images
+        # are resized beyond the one the caller holds, so lazy assets are not all decoded at once
+        if self.executor is None:
+            yield from (self._clipped(*item) for item in items)
+            return
+        clip_task = self._task(self._clipped)
+        pending = collections.deque()
+        for item in items:
+            pending.append(self.executor.submit(clip_task, *item))
+            if len(pending) > self.paste_ahead:
+                yield pending.popleft().result()  # the future no longer keeps it once pasted
+        while pending:
+            yield pending.popleft().result()
+
+
+    def _clipped(self, img, box, clip):
+        # Resize to the planned box, then cut off what falls outside the group
+        # (a lazy image is decoded here and its full size pixels freed on return)
+        img = self.resize_to(loaded(img), box.size)
+        if clip != box:
+            x, y = clip.offset(box)
+            img = img.crop((x, y, x + clip.width, y + clip.height))
+        return img, clip
+
+
+    @traced
+    def create_phone_body(self, columns):
+        """Phone flyer body. Supports full-width mode and 2-column layout."""
+        main, side = self.layout_body(columns)
 
-        # 4) Create composite canvas for side images
-        if self.side_is_vertical:
-            composite_side = Image.new("RGBA", (min(max(img.width for img in scaled_imgs), remaining_width), total_img_height), (0,0,0,0))
+        # Back views first (they sit half behind each other), then front views
+        self.paste_group(main, self.main_images())
 
-            y_offset = 0
-            for img in scaled_imgs:
-                x_offset = (composite_side.width - img.width) // 2  # center horizontally
-                composite_side.paste(img, (x_offset, y_offset), img)
-                y_offset += img.height + self.spacing_btw
+        # Handle side images
+        if side is not None:
+            self.paste_group(side, self.body_imgs.get('other', []))
 
-        else:
-            composite_side = Image.new("RGBA", (remaining_width, min(max(img.height for img in scaled_imgs), total_img_height)), (0,0,0,0))
 
-            x_offset = 0
-            for img in scaled_imgs:
-                y_offset = (composite_side.height - img.height) // 2  # center horizontally
-                composite_side.paste(img, (x_offset, y_offset), img)
-                x_offset += img.width + self.spacing_btw
+    @traced
+    def create_laptop_body(self, columns):
+        """Laptop flyer body with proper vertical centering."""
+        main, side = self.layout_body(columns)
 
-    
-        # 6) Compute final x, y positions to center inside remaining space
-        x_side = remaining_start + max(0, (remaining_width - composite_side.width) // 2)
+        self.paste_group(main, self.main_images())
 
-        # vertical centering inside usable_height
-        if composite_side.height <= usable_height:
-            y_side = usable_top + (usable_height - composite_side.height) // 2
-        else:
-            y_side = usable_top  # too tall → align top to avoid overflow
+        # Handle side images
+        if side is not None:
+            self.paste_group(side, self.body_imgs.get('other', []))
+          
 
-        # 7) Paste side images on background
-        self.background.paste(composite_side, (int(x_side), int(y_side)), composite_side)
+    @traced
+    def create_side_images(self, other_imgs, right_x, start_y, composite_main):
+        """
+        Handle the optional side/extra images, ensuring proper alignment, resizing,
+        and vertical centering inside the remaining space to the right of the main body.
+        """
+        side = self.layout_side_images(other_imgs, right_x, start_y, composite_main.width)
+        if side is None:
+            return  # nothing to do
+        self.paste_group(side, other_imgs)
 
         
 
@@ -488,63 +673,118 @@ class Flyer:
 
 
 
-    def fit_footer(self, footer_img_name, text):
-        ft_img = Image.open(footer_img_name)
-        bbox = ft_img.getbbox()
-        ft_img = ft_img.crop(bbox)
-        max_size = (150, 150)
-        ft_img = ImageOps.contain(ft_img, max_size)
-        icon_name = footer_img_name.split(".")[-2].split("\\")[-1]
-        img_text, _ = self.draw_wrapped_text(text, font_name=self.body_font, font_size=self.body_font_size, font_fill=self.body_font_fill, box_width=430) # text, font_name, font_size, font_fill, box_width
-
-        self.footer_img_list[icon_name] = [ft_img, img_text]
+    @traced
+    def fit_footer(self, footer_img_name, text, name=None):
+        icon_name = name or source_name(footer_img_name, default=f"footer_{len(self.footer_img_list)}")
+        self.footer_img_list[icon_name] = [self._fitted_icon(footer_img_name), self._footer_text(text)]
 
 
+    @traced
+    def fit_footer_many(self, items):
+        """
+        fit_footer for several items, icons and text blocks prepared concurrently on the executor.
 
+        Args:
+            items (list): (icon source, text, name) tuples, added in this order (name may be None).
+        """
+        items = list(items)
+        jobs = [(self._fitted_icon, icon) for icon, _, _ in items] + [(self._footer_text, text) for _, text, _ in items]
+        done = self._map(lambda job: job[0](job[1]), jobs)
+        for (icon, _, name), ft_img, img_text in zip(items, done[:len(items)], done[len(items):]):
+            icon_name = name or source_name(icon, default=f"footer_{len(self.footer_img_list)}")
+            self.footer_img_list[icon_name] = [ft_img, img_text]
 
 
-    def create_footer(self):
-        image_list = self.footer_img_list.values()
+    def _fitted_icon(self, footer_img_name):
+        params = {"op": "footer_icon", "box": list(self.geometry.footer_icon_max_size), "v": PREPARE_VERSION,
+                  "resample": int(self.contain_resample)}
+        return self._prepared(footer_img_name, params, lambda: self.prepare_icon(footer_img_name))
 
-        size = sum([img[0].width + img[1].width for img in image_list]) + 85 * (len(image_list))
 
-        
-        footer_height = max(
-            max(img[0].height, img[1].height)
-            for img in image_list
-        ) + 20
+    def _footer_text(self, text):
+        font_size = self.text_size(text, self.body_font, self.body_font_size, self.geometry.footer_text_box_width,
+                                   self.geometry.footer_text_box_height)
+        img_text, _ = self.draw_wrapped_text(text, font_name=self.body_font, font_size=font_size, font_fill=self.body_font_fill, box_width=self.geometry.footer_text_box_width) # text, font_name, font_size, font_fill, box_width
+        return img_text
 
 
-        composite = Image.new("RGBA", (size, footer_height), (0,0,0,0)) 
+    def prepare_icon(self, footer_img_name):
+        """Decode, trim and fit a footer icon into its box. Returns it as RGBA."""
+        ft_img = open_bounded(footer_img_name, self.geometry.footer_icon_max_size, trim=True)
+        self.count_resize(ft_img)
+        ft_img = ImageOps.contain(ft_img, self.geometry.footer_icon_max_size, self.contain_resample)
+        return ft_img if ft_img.mode == "RGBA" else ft_img.convert("RGBA")
 
-        past_dist = 0
 
-        for icons in image_list:
-            for icon in icons:
-                composite.paste(icon, (past_dist,0))
-                past_dist += icon.width + 20
-            
-            past_dist += 50
-        
-        x = (self.background.width - composite.width) //2
-        y = self.background.height - 700
 
-        self.background.paste(composite, (x, y), composite)
+    def layout_footer(self):
+        image_list = self.footer_img_list.values()
+        return layout.footer([(icon.size, text.size) for icon, text in image_list], self.background.size, self.geometry)
 
 
-    
+    @traced
+    def create_footer(self):
+        footer = self.layout_footer()
+        if footer is None:
+            raise ValueError("No footer items, call fit_footer first")
+
+        # Items never overlap, so each one is pasted directly where the footer composite would put it
+        imgs = [img for icons in self.footer_img_list.values() for img in icons]
+        for img, box in zip(imgs, footer.items):
+            clip = box.clip(footer.box)
+            if clip is None:
+                continue
+            img = loaded(img)
+            if img.mode != "RGBA":
+                img = img.convert("RGBA")
+            if clip != box:
+                x, y = clip.offset(box)
+                img = img.crop((x, y, x + clip.width, y + clip.height))
+            self.paste_on_background(img, (clip.x, clip.y), img)
+
+
+
+    @traced
     def fix_logo(self, logo_path):
-        logo_img = Image.open(logo_path)
-        logo_img = logo_img.convert("RGBA")
-        bbox = logo_img.getbbox()
-        logo_img = logo_img.crop(bbox)
-        max_size = (150, 150)
-        logo_img = ImageOps.contain(logo_img, max_size)
+        params = {"op": "logo", "box": list(self.geometry.logo_max_size), "resample": int(self.contain_resample),
+                  "v": PREPARE_VERSION}
+        logo_img = self._prepare(logo_path, params, lambda: self.prepare_logo(logo_path))  # pasted right away
 
-        self.background.paste(logo_img, (800, 600), logo_img)
+        box = layout.logo_box(logo_img.size, self.geometry)
+        self.paste_on_background(logo_img, (box.x, box.y), logo_img)
 
 
+    def prepare_logo(self, logo_path):
+        """Decode, trim and fit the logo into its box."""
+        logo_img = open_bounded(logo_path, self.geometry.logo_max_size, trim=True, mode="RGBA")
+        self.count_resize(logo_img)
+        return ImageOps.contain(logo_img, self.geometry.logo_max_size, self.contain_resample)
 
 
-    
+    @traced
+    def export(self, fp, format="PNG", **options):
+        """
+        Encode the flyer straight into a path, file object or socket (see export.export_image
+        for the options, or pass **export.PRESETS[name]).
+
+        Returns:
+            dict: Encode report: format, bytes written and encode time.
+        """
+        report = export.export_image(self.background, fp, format=format, **options)
+        if self.tracer is not None:
+            self.tracer.count("bytes_encoded", report["bytes"])
+        return report
 
+
+    @traced
+    def export_variants(self, out=None, variants=None, basename="flyer", **options):
+        """
+        Every channel size of the flyer from this one render (see export.export_variants).
+
+        Returns:
+            list[dict]: One encode report per variant.
+        """
+        reports = export.export_variants(self.background, variants, out, basename, **options)
+        if self.tracer is not None:
+            self.tracer.count("bytes_encoded", sum(report["bytes"] for report in reports))
+        return reports
@@ -0,0 +1,129 @@
+from PIL import ImageFont
+from collections import OrderedDict
+from io import BytesIO
+import threading
+import os
+
+
+class FontRegistry:
+    """
+    Process-wide cache of loaded FreeType fonts.
+
+    Fonts are keyed by (path, size, variation) and kept in a bounded LRU, so a
+    flyer (or a batch of flyers) only parses each font/size pair once. The raw
+    TTF bytes are kept per path too, so a new size of an already seen font does
+    not go back to disk.
+
+    Args:
+        maxsize (int): Fonts kept besides the preloaded ones (preload grows the
+            LRU by what it loads, so preloading never evicts and the sizes tried
+            by layout.fit_font_size still have room).
+    """
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.headroom = maxsize
+        self._preloaded = set()
+        self.hits = 0
+        self.misses = 0
+        self._fonts = OrderedDict()
+        self._font_bytes = {}
+        self._lock = threading.Lock()
+
+    def _read_bytes(self, path):
+        data = self._font_bytes.get(path)
+        if data is None:
+            with open(path, "rb") as f:
+                data = f.read()
+            self._font_bytes[path] = data
+        return data
+
+    def get(self, path, size, variation=None):
+        """
+        Return a FreeTypeFont for path at size, loading it on a miss.
+
+        Args:
+            path (str): Path to the .ttf font file.
+            size (int): Font size in pixels.
+            variation (str/bytes): Optional named instance for variable fonts.
+
+        Returns:
+            PIL.ImageFont.FreeTypeFont: The (shared) font object.
+        """
+        path = os.path.normpath(path)
+        key = (path, size, variation)
+        with self._lock:
+            font = self._fonts.get(key)
+            if font is not None:
+                self._fonts.move_to_end(key)
+                self.hits += 1
+                return font
+
+            self.misses += 1
+            font = ImageFont.truetype(BytesIO(self._read_bytes(path)), size)
+            if variation is not None:
+                font.set_variation_by_name(variation)
+
+            self._fonts[key] = font
+            if len(self._fonts) > self.maxsize:
+                self._fonts.popitem(last=False)
+            return font
+
+    def preload(self, font_folder="./fonts", sizes=()):
+        """
+        Read every .ttf in font_folder into memory, and build fonts for the given sizes.
+        The LRU grows to hold them all plus maxsize others. Preloading does not count
+        towards the hit/miss statistics.
+        """
+        names = sorted(name for name in os.listdir(font_folder) if name.lower().endswith(".ttf"))
+        with self._lock:
+            self._preloaded.update((os.path.normpath(os.path.join(font_folder, name)), size, None)
+                                   for name in names for size in sizes)
+            self.maxsize = max(self.maxsize, len(self._preloaded) + self.headroom)
+
+        loaded = []
+        for name in names:
+            path = os.path.normpath(os.path.join(font_folder, name))
+            with self._lock:
+                self._read_bytes(path)
+            for size in sizes:
+                key = (path, size, None)
+                with self._lock:
+                    if key in self._fonts:
+                        continue
+                    self._fonts[key] = ImageFont.truetype(BytesIO(self._font_bytes[path]), size)
+                    if len(self._fonts) > self.maxsize:
+                        self._fonts.popitem(last=False)
+            loaded.append(name)
+        return loaded
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._fonts),
+                "maxsize": self.maxsize,
+                "files": len(self._font_bytes),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._fonts.clear()
+            self._font_bytes.clear()
+            self._preloaded.clear()
+            self.maxsize = self.headroom
+            self.hits = 0
+            self.misses = 0
+
+
+# Shared registry used by Flyer
+font_registry = FontRegistry()
+
+
+def get_font(path, size, variation=None):
+    return font_registry.get(path, size, variation)
+
+
+def preload_fonts(font_folder="./fonts", sizes=()):
+    return font_registry.preload(font_folder, sizes)
@@ -0,0 +1,216 @@
+"""
+Layered, incremental rendering for interactive editing.
+
+Every section of the flyer (logo, title, subtitle, main body, side images,
+footer) is rendered into its own layer: the list of pastes Flyer would have
+made onto the background. A layer is keyed by everything its pixels depend on
+and is only rendered again when that key changes, so editing a footer text
+redoes the footer and nothing else, the body images are not resized again.
+
+The final image is the untouched background with every layer replayed in the
+usual paint order, pixel-identical to drawing on the flyer directly.
+
+    layered = LayeredFlyer(template.new_flyer(scale=0.25, quality="preview"))
+    layered.set_title("Galaxy S24")
+    layered.set_body([("front.png", "front", "main")])
+    image = layered.composite()
+    layered.set_title("Galaxy S24 Ultra")   # only the title layer is redrawn
+    image = layered.composite()
+"""
+from collections import namedtuple
+from flyer import body_slot
+from assets import source_name
+
+
+# Paint order of the layers, the order the app and batch renderer draw the sections in
+SECTIONS = ("logo", "title", "subtitle", "main", "side", "footer")
+
+# key: inputs the layer was rendered from, ops: (image, position, mask) pastes,
+# state: Flyer attributes the section sets (restored when the layer is reused)
+Layer = namedtuple("Layer", ["key", "ops", "state"])
+
+
+class Ref:
+    """Compares by identity, so images can be part of a cache key without comparing their pixels."""
+    __slots__ = ("obj",)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __eq__(self, other):
+        return isinstance(other, Ref) and other.obj is self.obj
+
+    def __hash__(self):
+        return id(self.obj)
+
+
+def source_key(source):
+    """Cache key part for an image source: paths and bytes by value, images and file objects by identity."""
+    if source is None or isinstance(source, (str, bytes)):
+        return source
+    return Ref(source)
+
+
+class LayeredFlyer:
+    """
+    Renders a Flyer section by section into cached layers.
+
+    The flyer's background is never drawn on. Settings read by the sections
+    (fonts, geometry, margins, flyer_type...) can be changed on the flyer
+    between updates, they are part of the layer keys.
+
+    Args:
+        flyer (Flyer): Freshly created flyer (nothing drawn or fitted yet).
+    """
+
+    def __init__(self, flyer):
+        self.flyer = flyer
+        self.base = flyer.background
+        self.layers = {}
+        self.hits = 0
+        self.misses = 0
+        self.rendered = []  # sections rendered since the last composite()
+        self._fitted_body = {}
+        self._fitted_footer = {}
+        self._image = None
+
+    def _update(self, name, key, draw, keep=()):
+        layer = self.layers.get(name)
+        if layer is not None and layer.key == key:
+            for attr, value in layer.state.items():
+                setattr(self.flyer, attr, value)
+            self.hits += 1
+            return
+
+        ops = []
+        self.flyer.layer = ops
+        try:
+            draw()
+        finally:
+            self.flyer.layer = None
+        self.layers[name] = Layer(key, ops, {attr: getattr(self.flyer, attr) for attr in keep})
+        self.misses += 1
+        self.rendered.append(name)
+        self._image = None
+
+    def drop(self, name):
+        """Remove a section (e.g. the logo was cleared)."""
+        if self.layers.pop(name, None) is not None:
+            self.rendered.append(name)
+            self._image = None
+
+    def set_fonts(self, fonts):
+        """
+        Change the flyer fonts.
+
+        Args:
+            fonts (dict): role ("title", "body", "subheader", "subheader_desc") -> (font path, size, fill),
+                sizes at full resolution as in batch.DEFAULT_FONTS.
+        """
+        for role, (font, size, fill) in fonts.items():
+            setattr(self.flyer, f"{role}_font", font)
+            setattr(self.flyer, f"{role}_font_size", self.flyer.scaled(size))
+            setattr(self.flyer, f"{role}_font_fill", fill)
+
+    def set_logo(self, logo):
+        if logo is None:
+            self.drop("logo")
+            return
+        self._update("logo", (source_key(logo), self.flyer.geometry), lambda: self.flyer.fix_logo(logo))
+
+    def set_title(self, title):
+        f = self.flyer
+        key = (title, f.title_font, f.title_font_size, f.title_font_fill, f.geometry)
+        self._update("title", key, lambda: f.create_title(title), keep=("title_height",))
+
+    def set_subtitle(self, subtitle, subtitle_description):
+        f = self.flyer
+        key = (subtitle, subtitle_description, f.title_height, f.geometry,
+               f.subheader_font, f.subheader_font_size, f.subheader_font_fill,
+               f.subheader_desc_font, f.subheader_desc_font_size, f.subheader_desc_font_fill)
+        self._update("subtitle", key, lambda: f.create_subtitle(subtitle, subtitle_description))
+
+    def set_body(self, items, columns=True):
+        """
+        Args:
+            items (list): (image source, face, part) as passed to Flyer.fit_body.
+            columns (bool): Two-column layout.
+        """
+        f = self.flyer
+        keys = [source_key(source) for source, _, _ in items]
+
+        # Only images that were not fitted before are processed (and sent to remove.bg)
+        new = [(k, source) for k, (source, _, _) in zip(keys, items) if k not in self._fitted_body]
+        if new and f.bg_removal == "removebg" and f.remove_bg_client is not None:
+            cutouts = f.process_and_remove_bg_many([source for _, source in new])
+            new = [(k, cutout or source) for (k, source), cutout in zip(new, cutouts)]
+
+        fitted = {k: self._fitted_body[k] for k in keys if k in self._fitted_body}
+        for k, source in new:
+            f.body_imgs = {}
+            f.fit_body(source)
+            fitted[k] = f.body_imgs['other'][0]
+        self._fitted_body = fitted
+
+        f.body_imgs = {}
+        for k, (_, face, part) in zip(keys, items):
+            f.body_imgs.setdefault(body_slot(face, part), []).append(fitted[k])
+
+        area = (f.background.size, f.start_x, f.start_y, f.right_margin, f.bottom_margin, columns)
+        main_key = (tuple(Ref(img) for img in f.main_images()), area)
+        side_key = (tuple(Ref(img) for img in f.body_imgs.get('other', [])), area,
+                    f.spacing_btw, f.side_is_vertical, f.geometry)
+
+        def draw_main():
+            main, _ = f.layout_body(columns)
+            f.paste_group(main, f.main_images())
+
+        def draw_side():
+            _, side = f.layout_body(columns)
+            if side is not None:
+                f.paste_group(side, f.body_imgs.get('other', []))
+
+        self._update("main", main_key, draw_main)
+        self._update("side", side_key, draw_side)
+
+    def set_footer(self, items):
+        """
+        Args:
+            items (list): (icon source, text, name) as passed to Flyer.fit_footer.
+        """
+        f = self.flyer
+        items = [(icon, text, name or source_name(icon, default=f"footer_{idx}"))
+                 for idx, (icon, text, name) in enumerate(items)]
+        font = (f.body_font, f.body_font_size, f.body_font_fill, f.geometry)
+        keys = [(source_key(icon), text, name, font) for icon, text, name in items]
+
+        fitted = {}
+        for k, (icon, text, name) in zip(keys, items):
+            if k not in self._fitted_footer:
+                f.footer_img_list = {}
+                f.fit_footer(icon, text, name)
+                self._fitted_footer[k] = next(iter(f.footer_img_list.values()))
+            fitted[k] = self._fitted_footer[k]
+        self._fitted_footer = fitted
+
+        if not items:
+            f.footer_img_list = {}
+            self.drop("footer")
+            return
+        f.footer_img_list = {name: fitted[k] for k, (_, _, name) in zip(keys, items)}
+        self._update("footer", (tuple(keys), f.background.size), f.create_footer)
+
+    def composite(self):
+        """
+        Returns:
+            PIL.Image: The background with every layer pasted in paint order (cached until a layer changes).
+        """
+        if self._image is None:
+            image = self.base.copy()
+            for name in SECTIONS:
+                layer = self.layers.get(name)
+                for img, position, mask in layer.ops if layer else ():
+                    image.paste(img, position, mask)
+            self._image = image
+        self.rendered = []
+        return self._image
@@ -0,0 +1,381 @@
+"""
+Pixel-free layout pass.
+
+Every element's final box is computed from image sizes and font metrics only,
+no resizing and no canvas allocation. Flyer uses these functions for its
+geometry and then only has to apply the plan, and callers can validate a
+plan (overflow, overlaps) before spending CPU on the LANCZOS resizes.
+"""
+from collections import namedtuple
+import functools
+import json
+import os
+from font_registry import get_font
+from text_layout import wrap_lines, lines_height
+
+
+class Box(namedtuple("Box", ["x", "y", "width", "height"])):
+    """Final position and size of one element on the flyer."""
+    __slots__ = ()
+
+    @property
+    def right(self):
+        return self.x + self.width
+
+    @property
+    def bottom(self):
+        return self.y + self.height
+
+    @property
+    def size(self):
+        return (self.width, self.height)
+
+    def offset(self, box):
+        """Position relative to the top-left corner of another box."""
+        return (self.x - box.x, self.y - box.y)
+
+    def overlaps(self, other):
+        return self.x < other.right and other.x < self.right and self.y < other.bottom and other.y < self.bottom
+
+    def clip(self, other):
+        """Part of this box inside another box, or None if it is entirely outside."""
+        x, y = max(self.x, other.x), max(self.y, other.y)
+        right, bottom = min(self.right, other.right), min(self.bottom, other.bottom)
+        if right <= x or bottom <= y:
+            return None
+        return Box(x, y, right - x, bottom - y)
+
+
+# A composite element: its bounding box plus the box of every image in it, in paste order
+Group = namedtuple("Group", ["box", "items"])
+
+# Template file the built-in defaults are read from (see template_spec.py)
+DEFAULT_TEMPLATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates", "default.json")
+
+
+class Geometry(namedtuple("Geometry", [
+    "title_pos", "title_box_width", "logo_pos", "logo_max_size", "subtitle_gap",
+    "subheader_box_width", "subheader_desc_box_width", "subheader_desc_gap",
+    "footer_icon_max_size", "footer_text_box_width", "footer_bottom_offset",
+    "footer_gap", "footer_item_gap", "footer_item_pad", "footer_pad_height", "side_pad",
+    "title_box_height", "subheader_box_height", "footer_text_box_height",
+])):
+    """
+    Fixed positions, boxes and gaps of the approved template (in background pixels).
+
+    footer_gap is between an icon and its text, footer_item_gap between footer items and
+    footer_item_pad the width allowance per footer item. The *_box_height fields are the
+    heights text is shrunk to when fitting text (Flyer's fit_text).
+    """
+    __slots__ = ()
+
+    def scaled(self, factor):
+        """Same geometry for a background scaled by factor (e.g. a low resolution preview)."""
+        if factor == 1:
+            return self
+        return Geometry(*[scale_value(v, factor) for v in self])
+
+
+def scale_value(value, factor):
+    if isinstance(value, tuple):
+        return tuple(scale_value(v, factor) for v in value)
+    return max(1, round(value * factor)) if value else value
+
+
+# Body area of the flyer: where the main and side images go, and the gap between side images
+class BodyLayout(namedtuple("BodyLayout", ["start_x", "start_y", "right_margin", "bottom_margin", "spacing_btw"])):
+    __slots__ = ()
+
+    def scaled(self, factor):
+        if factor == 1:
+            return self
+        return BodyLayout(*[scale_value(v, factor) for v in self])
+
+
+def _read_defaults(path=DEFAULT_TEMPLATE_FILE):
+    # Geometry and BodyLayout of the default template file, it has to set every field
+    with open(path, encoding="utf-8") as f:
+        spec = json.load(f)
+
+    def fields(cls, values):
+        return cls(**{k: tuple(v) if isinstance(v, list) else v for k, v in values.items()})
+    return fields(Geometry, spec["geometry"]), fields(BodyLayout, spec["body"])
+
+
+# The built-in layout is templates/default.json (in its reference_size pixels), the one place it is defined
+DEFAULT_GEOMETRY, DEFAULT_BODY = _read_defaults()
+
+# Everything a Flyer needs to place its elements (see template_spec.py for template files)
+FlyerLayout = namedtuple("FlyerLayout", ["geometry", "body"])
+
+DEFAULT_LAYOUT = FlyerLayout(DEFAULT_GEOMETRY, DEFAULT_BODY)
+
+
+def union(boxes):
+    """Smallest box containing all boxes."""
+    x, y = min(b.x for b in boxes), min(b.y for b in boxes)
+    return Box(x, y, max(b.right for b in boxes) - x, max(b.bottom for b in boxes) - y)
+
+
+def overlap_clusters(boxes):
+    """
+    Group boxes that overlap, directly or through other boxes.
+
+    Returns:
+        list: One list of indices into boxes per cluster, each in the original (paste) order.
+    """
+    clusters = []
+    for idx, box in enumerate(boxes):
+        touching = [c for c in clusters if any(box.overlaps(boxes[j]) for j in c)]
+        merged = sorted([idx] + [j for c in touching for j in c])
+        clusters = [c for c in clusters if not any(c is t for t in touching)] + [merged]
+    return clusters
+
+
+def scale_up_size(size, target_width, target_height):
+    """Size Flyer.scale_image_up resizes to (enlarge only, aspect ratio kept)."""
+    w, h = size
+    scale_factor = min(target_width / w, target_height / h)
+    if scale_factor > 1:
+        return int(w * scale_factor), int(h * scale_factor)
+    return w, h
+
+
+def fit_size(size, target_width, target_height):
+    """Size that fits exactly in the target box (enlarged or shrunk, aspect ratio kept)."""
+    w, h = size
+    scale_factor = min(max(1, target_width) / w, max(1, target_height) / h)
+    return max(1, int(w * scale_factor)), max(1, int(h * scale_factor))
+
+
+def contain_size(size, max_size):
+    """Size ImageOps.contain resizes to."""
+    w, h = size
+    im_ratio = w / h
+    dest_ratio = max_size[0] / max_size[1]
+    if im_ratio != dest_ratio:
+        if im_ratio > dest_ratio:
+            return max_size[0], round(h / w * max_size[0])
+        return round(w / h * max_size[1]), max_size[1]
+    return tuple(max_size)
+
+
+def text_block(text, font_name, font_size, box_width, line_spacing=0):
+    """
+    Size of the block draw_wrapped_text would produce, without drawing it.
+
+    Returns:
+        tuple: (width, height, number of lines)
+    """
+    lines = wrap_lines(text, get_font(font_name, font_size), box_width)
+    return box_width, max(lines_height(lines, line_spacing), 1), len(lines)
+
+
+def _text_fits(text, font_name, font_size, box_width, box_height, line_spacing):
+    lines = wrap_lines(text, get_font(font_name, font_size), box_width)
+    # A single word wider than the box is not broken by wrap_lines, it has to shrink too
+    return all(line.width <= box_width for line in lines) and lines_height(lines, line_spacing) <= box_height
+
+
+@functools.lru_cache(maxsize=4096)
+def fit_font_size(text, font_name, max_size, box_width, box_height, min_size=1, line_spacing=0):
+    """
+    Largest font size up to max_size whose wrapped text fits box_width x box_height.
+
+    Binary search over the sizes, each step is one wrap with cached fonts and word
+    widths (see text_block), nothing is drawn. Text that fits at max_size costs a
+    single pass.
+
+    Returns:
+        int: The font size, min_size when even that does not fit.
+    """
+    if _text_fits(text, font_name, max_size, box_width, box_height, line_spacing):
+        return max_size
+    best, lo, hi = min_size, min_size, max_size - 1
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        if _text_fits(text, font_name, mid, box_width, box_height, line_spacing):
+            best, lo = mid, mid + 1
+        else:
+            hi = mid - 1
+    return best
+
+
+def title_box(title_size, geo=DEFAULT_GEOMETRY):
+    return Box(geo.title_pos[0], geo.title_pos[1], *title_size)
+
+
+def logo_box(logo_size, geo=DEFAULT_GEOMETRY):
+    return Box(geo.logo_pos[0], geo.logo_pos[1], *contain_size(logo_size, geo.logo_max_size))
+
+
+def subtitle_boxes(title_height, subheader_size, desc_size, desc_lines, baseline_offset, geo=DEFAULT_GEOMETRY):
+    """Boxes of the subheader (left) and its description (right, baseline aligned when single line)."""
+    subheader_y = geo.title_pos[1] + title_height + geo.subtitle_gap
+    subheader = Box(geo.title_pos[0], subheader_y, *subheader_size)
+
+    desc_y = subheader_y + baseline_offset if desc_lines == 1 else subheader_y
+    desc = Box(geo.title_pos[0] + subheader.width + geo.subheader_desc_gap, desc_y, *desc_size)
+    return subheader, desc
+
+
+def body_area(canvas_size, start_x, start_y, right_margin, bottom_margin, columns):
+    """
+    Returns:
+        tuple: (left column width, usable height)
+    """
+    total_width = canvas_size[0] - (start_x + right_margin)
+    use_height = canvas_size[1] - (start_y + bottom_margin)
+    left_width = 2 * total_width // 3 if columns else total_width
+    return left_width, use_height
+
+
+def main_body(front_sizes, back_sizes, canvas_size, start_x, start_y, right_margin, bottom_margin, columns):
+    """
+    Layout of the main composite: back views (overlapping by half their width) then front views,
+    centred in the left column (or the whole width). Each image is fitted, up or down, to its share
+    of the column.
+
+    Returns:
+        Group: Composite box, items are the back images then the front images.
+    """
+    left_width, use_height = body_area(canvas_size, start_x, start_y, right_margin, bottom_margin, columns)
+
+    front = [fit_size(s, left_width // max(1, len(front_sizes)), use_height) for s in front_sizes]
+    back = [fit_size(s, left_width // max(1, len(back_sizes)), use_height) for s in back_sizes]
+
+    total_img_width = sum(w for w, _ in front) + sum(w // 2 for w, _ in back)
+    max_img_height = max([h for _, h in front + back], default=0)
+
+    if columns:
+        x_center = start_x + (left_width - total_img_width) // 2
+    else:
+        x_center = (canvas_size[0] - total_img_width) // 2
+    y_center = start_y + max(0, (use_height - max_img_height) // 2)
+
+    items = []
+    past_dist = 0
+    for w, h in back:
+        items.append(Box(x_center + past_dist, y_center, w, h))
+        past_dist += w // 2
+    for w, h in front:
+        items.append(Box(x_center + past_dist, y_center, w, h))
+        past_dist += w
+
+    return Group(Box(x_center, y_center, total_img_width, max_img_height), items)
+
+
+def side_images(other_sizes, right_x, start_y, main_width, canvas_size, right_margin, bottom_margin,
+                spacing_btw, vertical, geo=DEFAULT_GEOMETRY):
+    """
+    Layout of the side/extra images stacked in the space right of the main body,
+    each fitted (up or down) to its share of that space.
+
+    Returns:
+        Group: Side composite box and image boxes, or None without side images.
+    """
+    if not other_sizes:
+        return None
+
+    remaining_start = right_x + main_width + spacing_btw
+    remaining_end = canvas_size[0] - right_margin
+    remaining_width = max(0, remaining_end - remaining_start)
+
+    usable_top = start_y
+    usable_bottom = canvas_size[1] - bottom_margin
+    usable_height = max(0, usable_bottom - usable_top)
+
+    n = len(other_sizes)
+    adj_dist = spacing_btw * n + geo.side_pad
+    if vertical:
+        scaled = [fit_size(s, remaining_width - adj_dist, (usable_height - adj_dist) // max(1, n)) for s in other_sizes]
+    else:
+        scaled = [fit_size(s, (remaining_width - adj_dist) // max(1, n), usable_height - adj_dist) for s in other_sizes]
+    total_img_height = sum(h + spacing_btw for _, h in scaled)
+
+    offsets = []
+    if vertical:
+        comp_w, comp_h = min(max(w for w, _ in scaled), remaining_width), total_img_height
+        y_offset = 0
+        for w, h in scaled:
+            offsets.append(((comp_w - w) // 2, y_offset))
+            y_offset += h + spacing_btw
+    else:
+        comp_w, comp_h = remaining_width, min(max(h for _, h in scaled), total_img_height)
+        x_offset = 0
+        for w, h in scaled:
+            offsets.append((x_offset, (comp_h - h) // 2))
+            x_offset += w + spacing_btw
+
+    x_side = remaining_start + max(0, (remaining_width - comp_w) // 2)
+    if comp_h <= usable_height:
+        y_side = usable_top + (usable_height - comp_h) // 2
+    else:
+        y_side = usable_top  # too tall → align top to avoid overflow
+    x_side, y_side = int(x_side), int(y_side)
+
+    items = [Box(x_side + dx, y_side + dy, w, h) for (dx, dy), (w, h) in zip(offsets, scaled)]
+    return Group(Box(x_side, y_side, comp_w, comp_h), items)
+
+
+def footer(item_sizes, canvas_size, geo=DEFAULT_GEOMETRY):
+    """
+    Layout of the footer row, centred near the bottom of the flyer.
+
+    Args:
+        item_sizes (list): (icon size, text block size) per footer item.
+
+    Returns:
+        Group: Footer box, items alternate icon box and text box. None without items.
+    """
+    if not item_sizes:
+        return None
+
+    width = sum(icon[0] + text[0] for icon, text in item_sizes) + geo.footer_item_pad * len(item_sizes)
+    height = max(max(icon[1], text[1]) for icon, text in item_sizes) + geo.footer_pad_height
+    x = (canvas_size[0] - width) // 2
+    y = canvas_size[1] - geo.footer_bottom_offset
+
+    items = []
+    past_dist = 0
+    for icon, text in item_sizes:
+        for w, h in (icon, text):
+            items.append(Box(x + past_dist, y, w, h))
+            past_dist += w + geo.footer_gap
+        past_dist += geo.footer_item_gap
+
+    return Group(Box(x, y, width, height), items)
+
+
+def check_layout(plan):
+    """
+    Validate a plan from Flyer.plan_layout.
+
+    Returns:
+        list[str]: Problems found (empty if the flyer fits).
+    """
+    problems = []
+    canvas = Box(0, 0, *plan["canvas"])
+
+    boxes = {}
+    for name, element in plan.items():
+        if isinstance(element, Box):
+            boxes[name] = element
+        elif isinstance(element, Group):
+            boxes[name] = element.box
+
+    for name, box in boxes.items():
+        if box.x < 0 or box.y < 0 or box.right > canvas.width or box.bottom > canvas.height:
+            problems.append(f"{name} overflows the flyer ({box} on a {canvas.width}x{canvas.height} canvas)")
+
+    text_bottom = max(boxes[name].bottom for name in ("title", "subheader", "subheader_desc") if name in boxes)
+    for name in ("main", "side"):
+        if name in boxes and boxes[name].height and boxes[name].y < text_bottom:
+            problems.append(f"title/subtitle runs into the {name} images (text ends at y={text_bottom}, images start at y={boxes[name].y})")
+        if name in boxes and "footer" in boxes and boxes[name].overlaps(boxes["footer"]):
+            problems.append(f"{name} images overlap the footer")
+
+    if "main" in boxes and "side" in boxes and boxes["main"].overlaps(boxes["side"]):
+        problems.append("side images overlap the main images")
+
+    return problems
@@ -0,0 +1,47 @@
+"""
+Batch manifests: one flyer per row, read from CSV, JSON/JSONL or Parquet, and
+the helpers that turn their cells into lists and booleans (CSV cells are
+strings, JSON/Parquet ones can be real lists and bools). Columns are listed in
+batch.py.
+"""
+import json
+import csv
+import os
+
+
+def read_manifest(path):
+    """Read a CSV/JSON/Parquet manifest into a list of row dicts."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            return list(csv.DictReader(f))
+    if ext in (".json", ".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            if ext == ".jsonl":
+                return [json.loads(line) for line in f if line.strip()]
+            data = json.load(f)
+            return data["rows"] if isinstance(data, dict) else data
+    if ext == ".parquet":
+        import pandas as pd
+        return pd.read_parquet(path).to_dict(orient="records")
+    raise ValueError(f"Unsupported manifest format: {ext}")
+
+
+def as_list(value):
+    """A list cell: a real list (JSON/Parquet), a ";"-separated string (CSV), or empty."""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(";") if item.strip()]
+    if isinstance(value, float) and value != value:  # NaN from pandas
+        return []
+    return list(value)
+
+
+def as_bool(value, default=False):
+    """A yes/no cell: "1", "true", "yes", "y" (any case) or a real bool, default when empty."""
+    if value is None or value == "":
+        return default
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "y")
+    return bool(value)
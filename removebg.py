@@ -0,0 +1,131 @@
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from io import BytesIO
+from tenacity import Retrying, retry_if_exception_type, stop_after_attempt, wait_exponential
+from assets import image_bytes
+from cutout_cache import CutoutCache, DEFAULT_CACHE_DIR
+import functools
+import requests
+
+
+REMOVE_BG_URL = "https://api.remove.bg/v1.0/removebg"
+
+# Status codes worth retrying (rate limited / server side errors)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class RemoveBgRetryableError(Exception):
+    """Raised for a 429/5xx response so tenacity retries the request."""
+
+    def __init__(self, response):
+        super().__init__(f"{response.status_code} {response.text[:200]}")
+        self.response = response
+
+
+class RemoveBgClient:
+    """
+    remove.bg client that reuses HTTP connections, retries with exponential
+    backoff on 429/5xx, and can process many images concurrently.
+
+    Args:
+        api_key (str): remove.bg API key.
+        api_url (str): Endpoint, can point at a local stand-in server.
+        max_concurrency (int): Maximum requests in flight at once.
+        timeout (float): Per request timeout in seconds.
+        max_attempts (int): Attempts per image before giving up.
+        backoff (float): Base of the exponential backoff in seconds.
+        cache (CutoutCache): Optional persistent cache of cutouts.
+    """
+
+    def __init__(self, api_key, api_url=REMOVE_BG_URL, max_concurrency=4, timeout=60, max_attempts=4,
+                 backoff=1.0, size="auto", cache=None):
+        self.api_key = api_key
+        self.api_url = api_url
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.size = size
+        self.cache = cache
+
+        # Keep-alive pool big enough for every concurrent request
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._retrying = Retrying(
+            retry=retry_if_exception_type((RemoveBgRetryableError, requests.ConnectionError, requests.Timeout)),
+            wait=wait_exponential(multiplier=backoff, max=30),
+            stop=stop_after_attempt(max_attempts),
+            reraise=True,
+        )
+
+    def _post(self, data):
+        r = self.session.post(
+            self.api_url,
+            headers={"X-Api-Key": self.api_key},
+            files={"image_file": data},
+            data={"size": self.size},
+            timeout=self.timeout,
+        )
+        if r.status_code in RETRY_STATUS:
+            raise RemoveBgRetryableError(r)
+        return r
+
+    def remove(self, source):
+        """
+        Remove the background of one image.
+
+        Args:
+            source: Path, bytes, file-like object or PIL image.
+
+        Returns:
+            PIL.Image: RGBA cutout, or None if the API call failed.
+        """
+        data = image_bytes(source)
+
+        if self.cache is not None:
+            key = self.cache.key(data, {"engine": "remove.bg", "size": self.size})
+            cutout = self.cache.get(key)
+            if cutout is not None:
+                return cutout
+
+        try:
+            r = self._retrying.copy()(self._post, data)
+        except RemoveBgRetryableError as e:
+            r = e.response
+        except requests.RequestException as e:
+            print("Error:", e)
+            return None
+
+        if r.status_code == requests.codes.ok:
+            cutout = Image.open(BytesIO(r.content)).convert("RGBA")
+            if self.cache is not None:
+                self.cache.put(key, cutout)
+            return cutout
+        print("Error:", r.status_code, r.text)
+        return None
+
+    def remove_many(self, sources):
+        """
+        Remove the background of several images concurrently (at most max_concurrency at once).
+
+        Returns:
+            list: Cutouts (or None for failures) in the same order as sources.
+        """
+        sources = list(sources)
+        if len(sources) <= 1:
+            return [self.remove(src) for src in sources]
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(sources))) as pool:
+            return list(pool.map(self.remove, sources))
+
+    def close(self):
+        self.session.close()
+
+
+@functools.lru_cache(maxsize=None)
+def shared_client(api_key, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    One client per API key and cache directory in this process, so every flyer shares
+    its connection pool and cutout cache (the cache is only scanned once).
+    """
+    return RemoveBgClient(api_key, cache=CutoutCache(cache_dir or DEFAULT_CACHE_DIR))
@@ -0,0 +1,335 @@
+"""
+Local HTTP render service.
+
+Renders flyers for other systems (inventory, the listing bot) on a fixed pool
+of worker processes. Workers start warm: fonts are preloaded and the default
+background template is decoded before the first request. At most
+--workers + --queue renders are accepted at once, further requests get 429
+until a slot frees up.
+
+    python server.py --port 8080 -j 4 --queue 16 --timeout 60
+
+    POST /render   JSON body, responds with the encoded flyer
+    GET  /health   JSON: queue depth, in-flight renders, counts, latency percentiles
+
+The JSON body has the manifest fields of batch.py (title, subtitle,
+subtitle_description, flyer_type, columns, vertical, fit_text, footer_texts) and images as
+base64 strings: background (optional, default template), logo, front_images,
+back_images, other_images, footer_icons. Optional: "template" (a template name
+from templates/, default the background's), "export" (a preset name from
+export.PRESETS, default png) and "strict" (reject layouts that do not fit, 422).
+Nothing is read from the server's filesystem on a request's behalf.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict, deque
+from tornado.web import Application, RequestHandler
+from tornado.ioloop import IOLoop
+from export import PRESETS, extension
+from tracing import Tracer
+from template_spec import available_templates
+import batch
+import argparse
+import asyncio
+import binascii
+import hashlib
+import base64
+import json
+import time
+import io
+import os
+import sys
+
+
+IMAGE_FIELDS = ("background", "logo")
+IMAGE_LIST_FIELDS = ("front_images", "back_images", "other_images", "footer_icons")
+TEXT_FIELDS = ("title", "subtitle", "subtitle_description", "flyer_type", "columns", "vertical", "fit_text", "footer_texts")
+STRING_FIELDS = ("title", "subtitle", "subtitle_description", "flyer_type")
+
+MIME_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+# Latencies kept for the percentiles on /health
+LATENCY_WINDOW = 1000
+
+
+# ---------- WORKERS (one copy of this state per process) ----------
+_uploaded_templates = OrderedDict()
+MAX_UPLOADED_TEMPLATES = 8
+
+
+def _init_worker(fonts, font_folder, asset_store_dir=None, remove_bg_api_key=None, cutout_dir=None):
+    batch._init_worker(fonts, font_folder, asset_store_dir=asset_store_dir, remove_bg_api_key=remove_bg_api_key,
+                       cutout_dir=cutout_dir)
+    batch._template(batch.DEFAULT_BACKGROUND)  # decode the default background before the first request
+
+
+def _warm():
+    return True
+
+
+def _template(background, name=None):
+    # Uploaded backgrounds are keyed by content, a few are kept per worker
+    if background is None:
+        return batch._template(batch.DEFAULT_BACKGROUND, name)
+    key = (hashlib.sha256(background).hexdigest(), name)
+    template = _uploaded_templates.get(key)
+    if template is None:
+        template = _uploaded_templates[key] = batch.make_template(background, batch._fonts, name)
+        if len(_uploaded_templates) > MAX_UPLOADED_TEMPLATES:
+            _uploaded_templates.popitem(last=False)
+    else:
+        _uploaded_templates.move_to_end(key)
+    return template
+
+
+def _render(row, preset, strict):
+    """Render one request in a worker. Returns (encoded bytes, encode report, trace report)."""
+    tracer = Tracer()
+    flyer = batch.render_row(row, _template(row.get("background"), row.get("template")), strict=strict,
+                             asset_store=batch._asset_store, tracer=tracer,
+                             remove_bg_client=batch._remove_bg_client)
+    buf = io.BytesIO()
+    report = flyer.export(buf, **PRESETS[preset])
+    return buf.getvalue(), report, tracer.report()
+
+
+# ---------- REQUESTS ----------
+
+class BadRequest(ValueError):
+    pass
+
+
+def _decode_image(value, field):
+    if not isinstance(value, str):
+        raise BadRequest(f"{field} must be a base64 string")
+    try:
+        return base64.b64decode(value, validate=True)
+    except (binascii.Error, ValueError):
+        raise BadRequest(f"{field} is not valid base64")
+
+
+def parse_request(body):
+    """
+    Turn a JSON request body into a batch.py row (images as bytes), an export preset and the strict flag.
+
+    Raises:
+        BadRequest: Malformed JSON, images or preset.
+    """
+    try:
+        data = json.loads(body)
+    except (ValueError, UnicodeDecodeError):
+        raise BadRequest("body is not valid JSON")
+    if not isinstance(data, dict):
+        raise BadRequest("body must be a JSON object")
+
+    row = {field: data[field] for field in TEXT_FIELDS if field in data}
+    for field in STRING_FIELDS:
+        if not isinstance(row.get(field, ""), (str, type(None))):
+            raise BadRequest(f"{field} must be a string")
+    for field in IMAGE_FIELDS:
+        if data.get(field) is not None:
+            row[field] = _decode_image(data[field], field)
+    for field in IMAGE_LIST_FIELDS:
+        values = data.get(field) or []
+        if not isinstance(values, list):
+            raise BadRequest(f"{field} must be a list")
+        row[field] = [_decode_image(value, f"{field}[{idx}]") for idx, value in enumerate(values)]
+    footer_texts = row.get("footer_texts") or []
+    if not isinstance(footer_texts, list):
+        raise BadRequest("footer_texts must be a list")
+    for idx, text in enumerate(footer_texts):
+        if not isinstance(text, str):
+            raise BadRequest(f"footer_texts[{idx}] must be a string")
+
+    if data.get("template") is not None:
+        if data["template"] not in available_templates():  # a name, never a path
+            raise BadRequest(f"unknown template {data['template']!r}, choose from {available_templates()}")
+        row["template"] = data["template"]
+
+    preset = data.get("export", "png")
+    if preset not in PRESETS:
+        raise BadRequest(f"unknown export preset {preset!r}, choose from {sorted(PRESETS)}")
+    return row, preset, bool(data.get("strict", False))
+
+
+def percentile(values, q):
+    """q-th percentile (0-100) of values, nearest rank. None when empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+class RenderService:
+    """
+    Worker pool plus admission control.
+
+    Args:
+        workers (int): Worker processes.
+        queue_size (int): Renders that may wait for a worker, beyond that requests are rejected.
+        timeout (float): Seconds a request waits for its render before it gets a 504.
+        fonts (dict): Font settings as in batch.DEFAULT_FONTS, default the template files' fonts.
+        font_folder (str): Fonts preloaded by every worker.
+        asset_store_dir (str): Optional AssetStore directory shared by the workers.
+        remove_bg_api_key (str): Cut out body images with remove.bg, through the cutout cache in cutout_dir.
+        cutout_dir (str): Cutout cache directory (default the one `cutout_cache.py warm` fills).
+    """
+
+    def __init__(self, workers=2, queue_size=8, timeout=60.0, fonts=None, font_folder="./fonts",
+                 asset_store_dir=None, remove_bg_api_key=None, cutout_dir=None):
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.timeout = timeout
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                        initargs=(fonts, font_folder, asset_store_dir, remove_bg_api_key, cutout_dir))
+        self.pending = 0  # accepted renders not finished yet (running or queued)
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.counts = {"completed": 0, "failed": 0, "rejected": 0, "timed_out": 0}
+        self.started = time.time()
+
+    def warm_up(self):
+        """Start every worker now (fonts and default template load in their initializer)."""
+        for future in [self.pool.submit(_warm) for _ in range(self.workers)]:
+            future.result()
+
+    def _release(self, future):
+        self.pending -= 1
+        if not future.cancelled():
+            future.exception()  # retrieved, so renders that failed after a timeout are not logged as unhandled
+
+    async def render(self, row, preset, strict):
+        """
+        Returns:
+            tuple: (encoded bytes, encode report, trace report), or None when the queue is full.
+
+        Raises:
+            asyncio.TimeoutError: The render did not finish in time (it still occupies its slot until it does).
+        """
+        if self.pending >= self.capacity:
+            self.counts["rejected"] += 1
+            return None
+        self.pending += 1
+        t0 = time.perf_counter()
+        future = self.pool.submit(_render, row, preset, strict)
+        # The slot is only freed when the worker is done, a timed out render keeps it busy
+        wrapped = asyncio.wrap_future(future)
+        wrapped.add_done_callback(self._release)
+        try:
+            result = await asyncio.wait_for(asyncio.shield(wrapped), self.timeout)
+        except asyncio.TimeoutError:
+            self.counts["timed_out"] += 1
+            raise
+        except Exception:
+            self.counts["failed"] += 1
+            raise
+        self.counts["completed"] += 1
+        self.latencies.append(time.perf_counter() - t0)
+        return result
+
+    def stats(self):
+        latencies = list(self.latencies)
+        return {
+            "status": "ok",
+            "uptime": time.time() - self.started,
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "in_flight": min(self.pending, self.workers),
+            "queue_depth": max(0, self.pending - self.workers),
+            **self.counts,
+            "latency_ms": {f"p{q}": (None if value is None else round(value * 1000, 1))
+                           for q in (50, 90, 99) for value in [percentile(latencies, q)]},
+        }
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class RenderHandler(RequestHandler):
+    def initialize(self, service):
+        self.service = service
+
+    def _error(self, status, message):
+        self.set_status(status)
+        self.finish({"error": message})
+
+    async def post(self):
+        try:
+            row, preset, strict = parse_request(self.request.body)
+        except BadRequest as e:
+            return self._error(400, str(e))
+
+        try:
+            result = await self.service.render(row, preset, strict)
+        except asyncio.TimeoutError:
+            return self._error(504, f"render did not finish within {self.service.timeout:g}s")
+        except BrokenProcessPool:
+            return self._error(503, "worker pool is broken, restart the service")
+        except (ValueError, OSError) as e:  # strict layout check, unreadable images
+            return self._error(422, str(e))
+        except Exception as e:
+            return self._error(500, f"{type(e).__name__}: {e}")
+
+        if result is None:
+            self.set_header("Retry-After", "1")
+            return self._error(429, "render queue is full, retry later")
+
+        data, report, trace = result
+        self.set_header("Content-Type", MIME_TYPES.get(report["format"], "application/octet-stream"))
+        self.set_header("Content-Disposition", f'inline; filename="flyer.{extension(report["format"])}"')
+        self.set_header("X-Render-Seconds", f"{trace['total']:.3f}")
+        self.set_header("X-Encode-Seconds", f"{report['seconds']:.3f}")
+        self.finish(data)
+
+
+class HealthHandler(RequestHandler):
+    def initialize(self, service):
+        self.service = service
+
+    def get(self):
+        self.finish(self.service.stats())
+
+
+def make_app(service):
+    return Application([
+        (r"/render", RenderHandler, {"service": service}),
+        (r"/health", HealthHandler, {"service": service}),
+    ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local flyer render service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("-j", "--workers", type=int, default=2, help="Worker processes")
+    parser.add_argument("--queue", type=int, default=8, help="Renders that may wait for a worker before 429s")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds before a request gets a 504")
+    parser.add_argument("--font-folder", default="./fonts")
+    parser.add_argument("--asset-store", metavar="DIR", default=None,
+                        help="Share preprocessed assets between workers and restarts (e.g. .cache/assets)")
+    parser.add_argument("--remove-bg", action="store_true", help="Cut out body images with remove.bg (cached)")
+    parser.add_argument("--api-key", default=os.environ.get("REMOVE_BG_API_KEY"), help="remove.bg API key")
+    parser.add_argument("--cutout-cache", metavar="DIR", default=None)
+    parser.add_argument("--max-body-mb", type=int, default=64, help="Largest accepted request body")
+    args = parser.parse_args(argv)
+    if args.remove_bg and not args.api_key:
+        parser.error("--remove-bg needs --api-key or REMOVE_BG_API_KEY")
+
+    service = RenderService(args.workers, args.queue, args.timeout, font_folder=args.font_folder,
+                            asset_store_dir=args.asset_store,
+                            remove_bg_api_key=args.api_key if args.remove_bg else None, cutout_dir=args.cutout_cache)
+    service.warm_up()
+    app = make_app(service)
+    app.listen(args.port, args.host, max_body_size=args.max_body_mb * 1024 ** 2)
+    print(f"Rendering on http://{args.host}:{args.port} ({args.workers} workers, queue {args.queue})")
+    try:
+        IOLoop.current().start()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+from flyer import Flyer
+from font_registry import get_font
+from assets import open_image
+from template_spec import compiled_template, find_template, FONT_ROLES
+import layout
+
+
+class FlyerTemplate:
+    """
+    Everything that is the same for every flyer on one background: the decoded
+    background, the fonts and the fixed layout constants.
+
+    Decode once, then render many flyers from it:
+
+        template = FlyerTemplate("background/new.png", title_font, 200, "#000000", ...)
+        flyer = template.new_flyer(flyer_type="phone")
+        ...
+        flyer.reset()  # next product, starts again from a copy of the template background
+
+    or from a template file (see template_spec.py), with its fonts and per flyer type layout:
+
+        template = FlyerTemplate.from_file("templates/used.json")
+    """
+
+    def __init__(self, bg_name, title_font, title_font_size, title_font_fill, body_font, body_font_size, body_font_fill,
+                 subheader_font, subheader_font_size, subheader_font_fill, subheader_desc_font, subheader_desc_font_size,
+                 subheader_desc_font_fill, start_x=None, right_margin=None, start_y=None, bottom_margin=None,
+                 spacing_btw=None, layouts=None):
+        self.background = open_image(bg_name)
+        self.background.load()  # decode now, not on the first flyer
+
+        self.font_args = (
+            title_font, title_font_size, title_font_fill,
+            body_font, body_font_size, body_font_fill,
+            subheader_font, subheader_font_size, subheader_font_fill,
+            subheader_desc_font, subheader_desc_font_size, subheader_desc_font_fill,
+        )
+
+        # Load every font once (shared through the font registry)
+        self.fonts = {
+            "title": get_font(title_font, title_font_size),
+            "body": get_font(body_font, body_font_size),
+            "subheader": get_font(subheader_font, subheader_font_size),
+            "subheader_desc": get_font(subheader_desc_font, subheader_desc_font_size),
+        }
+
+        # layout.FlyerLayout per flyer type (compiled from a template file), else the defaults
+        # (templates/default.json) with the margins given here
+        margins = dict(start_x=start_x, start_y=start_y, right_margin=right_margin, bottom_margin=bottom_margin,
+                       spacing_btw=spacing_btw)
+        body = layout.DEFAULT_BODY._replace(**{k: v for k, v in margins.items() if v is not None})
+        self.default_layout = layout.FlyerLayout(layout.DEFAULT_GEOMETRY, body)
+        self.layouts = dict(layouts or ())
+
+    @classmethod
+    def from_file(cls, path=None, background=None, fonts=None):
+        """
+        Template from a template file, compiled for the actual background size.
+
+        Args:
+            path (str): Template file (default: the one find_template picks for background).
+            background: Background to use instead of the one named in the file (path, bytes, image...).
+            fonts (dict): {role: (path, size, fill)} to use instead of the file's fonts.
+        """
+        path = path or find_template(background)
+        spec = compiled_template(path)
+        bg = background if background is not None else spec.background
+        if bg is None:
+            raise ValueError(f"{path} names no background, pass one")
+        size = open_image(bg).size  # header only, the full decode happens once in __init__
+        compiled = compiled_template(path, size)
+        font_args = compiled.font_args if fonts is None else tuple(
+            value for role in FONT_ROLES for value in fonts[role])
+        return cls(bg, *font_args, layouts=compiled.layouts)
+
+    @property
+    def size(self):
+        return self.background.size
+
+    def new_flyer(self, flyer_type="phone", vertical=False, remove_bg_api_key=None, scale=1.0, quality="final",
+                  asset_store=None, tracer=None, lazy_assets=False, executor=None,
+                  fit_text=False, remove_bg_client=None, bg_removal=None):
+        """
+        Create a Flyer that draws on a copy of the template background
+        (a scaled copy for previews, see Flyer's scale and quality).
+        Pass an AssetStore to share preprocessed assets between flyers and processes,
+        and a tracing.Tracer to time its stages. lazy_assets keeps body images and
+        footer icons undecoded until they are pasted, and a thread executor prepares
+        independent assets concurrently. fit_text shrinks texts that overflow their
+        boxes. A RemoveBgClient (e.g. removebg.shared_client) with bg_removal="removebg"
+        cuts out body images through one connection pool and cutout cache (see Flyer).
+
+        Returns:
+            Flyer: A fresh flyer, call reset() on it to render the next product.
+        """
+        return Flyer(self.background, *self.font_args,
+                     flyer_type=flyer_type, vertical=vertical, remove_bg_api_key=remove_bg_api_key,
+                     remove_bg_client=remove_bg_client, bg_removal=bg_removal,
+                     scale=scale, quality=quality, asset_store=asset_store, tracer=tracer,
+                     flyer_layout=self.layouts.get(flyer_type, self.default_layout), lazy_assets=lazy_assets,
+                     executor=executor, fit_text=fit_text)
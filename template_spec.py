@@ -0,0 +1,196 @@
+"""
+Declarative flyer templates.
+
+A template file (JSON or TOML, in templates/) describes one background: its
+fonts, the element positions and boxes (layout.Geometry fields) and the body
+area (layout.BodyLayout fields), with overrides per flyer_type. Coordinates are
+in pixels of reference_size; compiling a template for an actual background size
+scales them, so a new background only needs a new file, not code.
+
+    {
+      "extends": "default",
+      "background": "background/used.png",
+      "geometry": {"title_pos": [800, 900]},
+      "flyer_types": {"laptop": {"body": {"start_y": 1700}}}
+    }
+
+compiled_template() parses and compiles a file once per process (per size)
+into a CompiledTemplate: nested namedtuples with every derived position
+already scaled, safe to share between threads and to send to worker processes.
+"""
+from collections import namedtuple
+import functools
+import tomllib
+import json
+import os
+
+from layout import Geometry, BodyLayout, FlyerLayout, DEFAULT_GEOMETRY, DEFAULT_BODY, scale_value
+
+
+TEMPLATE_DIR = "templates"
+DEFAULT_TEMPLATE = "default"
+EXTENSIONS = (".json", ".toml")
+
+FLYER_TYPES = ("phone", "laptop")
+FONT_ROLES = ("title", "body", "subheader", "subheader_desc")
+
+# A font as (path, size, fill), like batch.DEFAULT_FONTS
+FontSpec = namedtuple("FontSpec", ["path", "size", "fill"])
+
+
+class CompiledTemplate(namedtuple("CompiledTemplate", ["name", "background", "size", "fonts", "layouts"])):
+    """
+    A template compiled for one background size.
+
+    Attributes:
+        name (str): Template name (file name without extension).
+        background (str): Background image path, or None.
+        size (tuple): Background size the positions are computed for.
+        fonts (tuple): FontSpec per role, in FONT_ROLES order.
+        layouts (tuple): (flyer_type, layout.FlyerLayout) pairs.
+    """
+    __slots__ = ()
+
+    def layout(self, flyer_type):
+        for name, flyer_layout in self.layouts:
+            if name == flyer_type:
+                return flyer_layout
+        raise ValueError(f"Template {self.name!r} has no layout for flyer type {flyer_type!r}")
+
+    def font_dict(self):
+        """Fonts as {role: (path, size, fill)}, the format of batch.DEFAULT_FONTS."""
+        return {role: tuple(font) for role, font in zip(FONT_ROLES, self.fonts)}
+
+    @property
+    def font_args(self):
+        """Fonts in the positional order of Flyer and FlyerTemplate (title, body, subheader, subheader_desc)."""
+        return tuple(value for font in self.fonts for value in font)
+
+
+def template_path(name, template_dir=TEMPLATE_DIR):
+    """Path of a template by name, or None if there is no such file."""
+    for ext in EXTENSIONS:
+        path = os.path.join(template_dir, name + ext)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def available_templates(template_dir=TEMPLATE_DIR):
+    if not os.path.isdir(template_dir):
+        return []
+    return sorted({os.path.splitext(f)[0] for f in os.listdir(template_dir) if f.endswith(EXTENSIONS)})
+
+
+def find_template(background, template_dir=TEMPLATE_DIR):
+    """
+    Template file for a background: templates/<background file name>.json/.toml if there is one,
+    else the default template (also for backgrounds given as bytes or images).
+    """
+    if isinstance(background, str):
+        path = template_path(os.path.splitext(os.path.basename(background))[0], template_dir)
+        if path is not None:
+            return path
+    return template_path(DEFAULT_TEMPLATE, template_dir)
+
+
+def read_spec(path):
+    """Parse a template file, following "extends" (the parent's values are overridden key by key)."""
+    with open(path, "rb") as f:
+        spec = tomllib.load(f) if path.endswith(".toml") else json.load(f)
+
+    parent = spec.pop("extends", None)
+    if parent is None:
+        return spec
+    parent_path = template_path(parent, os.path.dirname(path))
+    if parent_path is None or os.path.abspath(parent_path) == os.path.abspath(path):
+        raise ValueError(f"{path}: cannot extend {parent!r}")
+    return _merge(read_spec(parent_path), spec)
+
+
+def _merge(base, override):
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _fields(cls, defaults, values, where):
+    # namedtuple of cls from defaults overridden by values, lists become tuples
+    unknown = set(values) - set(cls._fields)
+    if unknown:
+        raise ValueError(f"{where}: unknown keys {sorted(unknown)}")
+    return defaults._replace(**{k: tuple(v) if isinstance(v, list) else v for k, v in values.items()})
+
+
+def scale_factor(size, reference):
+    # One factor for both axes, so nothing is distorted and everything still fits
+    return min(size[0] / reference[0], size[1] / reference[1])
+
+
+def compile_spec(spec, size=None, name=None):
+    """
+    Compile a parsed template for a background of the given size.
+
+    Args:
+        spec (dict): Parsed template (see read_spec).
+        size (tuple): Actual background size, default the template's reference_size.
+        name (str): Template name, for error messages.
+
+    Returns:
+        CompiledTemplate
+
+    Raises:
+        ValueError: Unknown keys, flyer types or font roles.
+    """
+    name = name or spec.get("name", "template")
+    known = {"name", "background", "reference_size", "fonts", "geometry", "body", "flyer_types"}
+    unknown = set(spec) - known
+    if unknown:
+        raise ValueError(f"{name}: unknown keys {sorted(unknown)}")
+
+    reference = tuple(spec.get("reference_size", (4500, 4500)))
+    size = tuple(size or reference)
+    factor = scale_factor(size, reference)
+
+    fonts = spec.get("fonts", {})
+    missing = [role for role in FONT_ROLES if role not in fonts]
+    if missing or set(fonts) - set(FONT_ROLES):
+        raise ValueError(f"{name}: fonts must define exactly {list(FONT_ROLES)}")
+    font_specs = tuple(FontSpec(fonts[role]["font"], scale_value(fonts[role]["size"], factor),
+                                fonts[role].get("fill", "#000000")) for role in FONT_ROLES)
+
+    geometry = _fields(Geometry, DEFAULT_GEOMETRY, spec.get("geometry", {}), f"{name} geometry")
+    body = _fields(BodyLayout, DEFAULT_BODY, spec.get("body", {}), f"{name} body")
+
+    per_type = spec.get("flyer_types", {})
+    if set(per_type) - set(FLYER_TYPES):
+        raise ValueError(f"{name}: flyer_types must be among {list(FLYER_TYPES)}")
+
+    layouts = []
+    for flyer_type in FLYER_TYPES:
+        overrides = per_type.get(flyer_type, {})
+        if set(overrides) - {"geometry", "body"}:
+            raise ValueError(f"{name} {flyer_type}: only geometry and body can be overridden")
+        type_geometry = _fields(Geometry, geometry, overrides.get("geometry", {}), f"{name} {flyer_type} geometry")
+        type_body = _fields(BodyLayout, body, overrides.get("body", {}), f"{name} {flyer_type} body")
+        layouts.append((flyer_type, FlyerLayout(type_geometry.scaled(factor), type_body.scaled(factor))))
+
+    return CompiledTemplate(name, spec.get("background"), size, font_specs, tuple(layouts))
+
+
+@functools.lru_cache(maxsize=64)
+def _compiled(path, mtime, size):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return compile_spec(read_spec(path), size, name)
+
+
+def compiled_template(path, size=None):
+    """
+    Compiled template of a file, parsed and compiled once per process and size
+    (edited files are picked up through their modification time).
+    """
+    return _compiled(os.path.normpath(path), os.path.getmtime(path), tuple(size) if size else None)
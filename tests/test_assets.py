@@ -0,0 +1,117 @@
+"""
+Bounded ingest (assets.open_bounded) through Flyer's prepare steps: palette
+assets, and padded assets compared against decoding at full size.
+
+Run from the repo root:
+    python -m pytest tests
+"""
+from PIL import Image, ImageChops, ImageDraw, ImageOps, ImageStat
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from assets import open_bounded
+from flyer import Flyer
+
+FONTS = [os.path.join(ROOT, "fonts", "Poppins-Black.ttf"), 200, "#000000",
+         os.path.join(ROOT, "fonts", "Poppins-Regular.ttf"), 90, "#000000",
+         os.path.join(ROOT, "fonts", "Poppins-Regular.ttf"), 150, "#000000",
+         os.path.join(ROOT, "fonts", "Poppins-Regular.ttf"), 90, "#000000"]
+BACKGROUND = Image.new("RGB", (4500, 4500), "white")
+
+
+def flyer(scale=1.0):
+    return Flyer(BACKGROUND, *FONTS, scale=scale, quality="final" if scale == 1 else "preview")
+
+
+def subject(size):
+    """Detailed RGBA subject (stripes and a ring), so blurring shows up in the difference."""
+    img = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    for x in range(0, size, size // 12):
+        draw.line((x, 0, x, size), fill=(200, 30, 30, 255), width=max(1, size // 50))
+    draw.ellipse((size // 8, size // 8, size - size // 8, size - size // 8), outline=(20, 20, 160, 255),
+                 width=max(1, size // 40))
+    return img
+
+
+def padded(size, subject_size):
+    img = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+    img.paste(subject(subject_size), ((size - subject_size) // 2, (size - subject_size) // 2))
+    return img
+
+
+def mean_diff(a, b):
+    assert a.size == b.size
+    return sum(ImageStat.Stat(ImageChops.difference(a.convert("RGBA"), b.convert("RGBA"))).mean) / 4
+
+
+def unbounded(path, box, mode=None, resample=Image.Resampling.BICUBIC):
+    # Full size decode, trim, fit: what open_bounded must stay close to
+    img = Image.open(path)
+    if mode:
+        img = img.convert(mode)
+    img = img.crop(img.getbbox())
+    return ImageOps.contain(img, box, resample).convert("RGBA")
+
+
+@pytest.fixture
+def palette_logo(tmp_path):
+    path = tmp_path / "logo.png"
+    img = padded(800, 500).convert("RGB").quantize(16)  # P mode
+    img.info["transparency"] = 0
+    img.save(path, transparency=0)
+    assert Image.open(path).mode == "P"
+    return str(path)
+
+
+@pytest.mark.parametrize("scale", [1.0, 0.25])
+def test_palette_logo_and_icon(palette_logo, scale):
+    f = flyer(scale)
+    f.fix_logo(palette_logo)
+    f.fit_footer(palette_logo, "Warranty")
+    icon, _ = f.footer_img_list["logo"]
+    assert icon.mode == "RGBA"
+    assert max(icon.size) == max(f.geometry.footer_icon_max_size)
+
+
+@pytest.mark.parametrize("mode", ["1", "I;16"])
+def test_reduce_unsupported_modes(tmp_path, mode):
+    path = tmp_path / f"{mode.replace(';', '')}.png"
+    Image.new(mode, (1600, 1600), 1).save(path)
+    img = open_bounded(str(path), (150, 150))
+    assert max(img.size) < 1600
+
+
+def test_padded_icon_matches_unbounded(tmp_path):
+    path = str(tmp_path / "icon.png")
+    padded(1200, 300).save(path)
+    f = flyer()
+    box = f.geometry.footer_icon_max_size
+    assert mean_diff(f.prepare_icon(path), unbounded(path, box)) < 2
+
+
+def test_padded_logo_matches_unbounded(tmp_path):
+    path = str(tmp_path / "logo.png")
+    padded(1200, 300).save(path)
+    f = flyer()
+    assert mean_diff(f.prepare_logo(path), unbounded(path, f.geometry.logo_max_size, "RGBA")) < 2
+
+
+def test_padded_jpeg_gets_the_resolution_the_subject_needs(tmp_path):
+    # Black padding is trimmed by getbbox, a draft for the whole frame would be too small for the subject
+    path = str(tmp_path / "shot.jpg")
+    img = Image.new("RGB", (4000, 4000), "black")
+    img.paste(subject(600).convert("RGB"), (1700, 1700))
+    img.save(path, quality=95)
+
+    box = (300, 300)
+    bounded = open_bounded(path, box, trim=True)
+    assert min(box[0] / bounded.width, box[1] / bounded.height) <= 1  # fitting it never scales up
+    reference = unbounded(path, box, resample=Image.Resampling.LANCZOS)
+    # box reduction plus JPEG noise, a draft picked for the whole frame (upscaled 4x) is about 13 off
+    assert mean_diff(ImageOps.contain(bounded, box, Image.Resampling.LANCZOS), reference) < 4
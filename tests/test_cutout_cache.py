@@ -0,0 +1,37 @@
+"""
+CutoutCache eviction order and manifest_images.
+
+Run from the repo root:
+    python -m pytest tests
+"""
+from PIL import Image
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cutout_cache import CutoutCache, manifest_images
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = CutoutCache(str(tmp_path), max_bytes=10 ** 9)
+    for n, key in enumerate(("a" * 64, "b" * 64, "c" * 64)):
+        cache.put(key, Image.new("RGBA", (64, 64), (n, 0, 0, 255)))
+        path = cache._path(key)
+        os.utime(path, (1000 + n, 1000 + n))  # written in this order, long ago
+
+    assert cache.get("a" * 64) is not None  # the oldest write is the most recent use
+    size = os.path.getsize(cache._path("a" * 64))
+    cache.max_bytes = 2 * size + size // 2
+    cache.evict(target_ratio=1.0)
+
+    assert cache.get("b" * 64) is None
+    assert cache.get("a" * 64) is not None
+    assert cache.get("c" * 64) is not None
+
+
+def test_manifest_images():
+    rows = [{"front_images": "a.png; b.png", "back_images": ["c.png"]},
+            {"front_images": "b.png", "other_images": float("nan")}]
+    assert manifest_images(rows) == ["a.png", "b.png", "c.png"]
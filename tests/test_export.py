@@ -0,0 +1,37 @@
+"""
+export.export_image targets and option checks.
+
+Run from the repo root:
+    python -m pytest tests
+"""
+from PIL import Image
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from export import export_image
+
+IMAGE = Image.new("RGBA", (64, 64), (200, 30, 30, 128))
+
+
+def test_path_target(tmp_path):
+    path = tmp_path / "flyer.png"  # pathlib.Path, not str
+    report = export_image(IMAGE, path)
+    assert report["bytes"] == path.stat().st_size
+    assert Image.open(path).size == IMAGE.size
+
+
+def test_quantize_png(tmp_path):
+    report = export_image(IMAGE, tmp_path / "flyer.png", quantize=16)
+    assert report["mode"] == "P"
+
+
+def test_quantize_jpeg_is_refused(tmp_path):
+    path = tmp_path / "flyer.jpg"
+    with pytest.raises(ValueError, match="palette"):
+        export_image(IMAGE, path, format="JPEG", quantize=16)
+    assert not path.exists()
@@ -0,0 +1,58 @@
+"""
+Peak memory of lazy assets (lazy_assets=True) on the many-image phone flyer of
+benchmarks/bench_lazy.py, each render in a fresh process (Linux only, peak RSS
+comes from /proc).
+
+Pasting one lazy asset at a time needs the canvas plus the decoded asset and
+its resized copy; with an asset store of hits that holds for the whole run.
+Without a store, fitting also decodes one source at a time.
+
+Run from the repo root:
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from bench_lazy import run, write_assets
+
+pytestmark = pytest.mark.skipif(not os.path.exists("/proc/self/clear_refs"), reason="needs Linux /proc")
+
+
+@pytest.fixture(scope="module")
+def assets(tmp_path_factory):
+    folder = str(tmp_path_factory.mktemp("lazy"))
+    write_assets(folder)
+    run("lazy+store", folder)  # fill the store
+    return folder
+
+
+def paste_bound(r, images=2):
+    return r["canvas_bytes"] + images * r["largest_asset_bytes"]
+
+
+def test_lazy_store_hits(assets):
+    r = run("lazy+store", assets)
+    assert r["rss_peak_delta"] < paste_bound(r)
+
+
+def test_lazy_without_store(assets):
+    r = run("lazy", assets)
+    assert r["paste_peak_delta"] < paste_bound(r)
+    # one source decoded at a time while fitting, the fitted assets are not kept in memory
+    assert r["rss_peak_delta"] < r["canvas_bytes"] + r["largest_source_bytes"] + r["largest_asset_bytes"]
+    assert r["sha256"] == run("eager", assets)["sha256"]
+
+
+def test_lazy_with_executor(assets):
+    from flyer import Flyer
+
+    r = run("lazy", assets, threads=4)
+    # paste_ahead images resized beyond the one being pasted (each decoded and resized),
+    # not every image of the group at once
+    assert r["paste_peak_delta"] < paste_bound(r, 2 * (Flyer.paste_ahead + 1))
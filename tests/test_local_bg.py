@@ -0,0 +1,48 @@
+"""
+LocalBgRemover on a product shot against a plain studio backdrop.
+
+Run from the repo root:
+    python -m pytest tests
+"""
+from PIL import Image, ImageDraw
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from local_bg import LocalBgRemover
+
+
+def shot(size=(4000, 3000)):
+    # A dark product with a light hole (backdrop colour, but not connected to the border)
+    img = Image.new("RGB", size, (235, 235, 235))
+    draw = ImageDraw.Draw(img)
+    draw.rounded_rectangle((1000, 200, 3000, 2800), radius=300, fill=(30, 30, 40))
+    draw.ellipse((1800, 1300, 2200, 1700), fill=(235, 235, 235))
+    return img
+
+
+def test_backdrop_connected_to_the_border_only():
+    out = LocalBgRemover().remove_background(shot())
+    alpha = out.getchannel("A")
+    assert out.size == (4000, 3000)
+    assert alpha.getpixel((10, 10)) == 0
+    assert alpha.getpixel((500, 1500)) == 0
+    assert alpha.getpixel((1500, 1500)) == 255  # product
+    assert alpha.getpixel((2000, 1500)) == 255  # enclosed hole stays opaque
+    # the mask is made at about 1/4 scale, its edge lands within 3 mask pixels of the product's
+    assert all(abs(a - b) <= 12 for a, b in zip(out.getbbox(), (1000, 200, 3001, 2801)))
+
+
+def test_feathered_edge():
+    alpha = LocalBgRemover(feather=3).remove_background(shot()).getchannel("A")
+    edge = [alpha.getpixel((x, 1500)) for x in range(990, 1010)]
+    assert edge == sorted(edge)  # ramps up into the product
+    assert any(0 < v < 255 for v in edge)
+
+
+def test_keeps_existing_transparency():
+    img = shot().convert("RGBA")
+    img.putpixel((1500, 1500), (30, 30, 40, 0))
+    assert LocalBgRemover().remove_background(img).getchannel("A").getpixel((1500, 1500)) == 0
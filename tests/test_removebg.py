@@ -0,0 +1,114 @@
+"""
+RemoveBgClient against a local stand-in for the remove.bg API.
+
+Every image gets a 503 on its first request and a cutout on the second, the
+cutout's red channel is the image number so the order can be checked.
+
+Run from the repo root:
+    python -m pytest tests
+"""
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from collections import Counter
+from PIL import Image
+from io import BytesIO
+import threading
+import time
+import re
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from removebg import RemoveBgClient
+
+
+class StandIn(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, delay=0.05):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.attempts = Counter()  # image number -> requests
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.connections = set()  # client ports, one per kept-alive connection
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/removebg"
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is visible
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        number = int(re.search(rb"img-(\d+)", body).group(1))
+        with server.lock:
+            server.attempts[number] += 1
+            first = server.attempts[number] == 1
+            server.connections.add(self.client_address[1])
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        time.sleep(server.delay)
+        with server.lock:
+            server.in_flight -= 1
+
+        if first:
+            status, data, content_type = 503, b"busy", "text/plain"
+        else:
+            buf = BytesIO()
+            Image.new("RGBA", (1, 1), (number, 0, 0, 255)).save(buf, format="PNG")
+            status, data, content_type = 200, buf.getvalue(), "image/png"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def server():
+    server = StandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_remove_retries_server_errors(server):
+    client = RemoveBgClient("key", api_url=server.url, backoff=0)
+    cutout = client.remove(b"img-7")
+    client.close()
+
+    assert cutout.mode == "RGBA"
+    assert cutout.getpixel((0, 0))[0] == 7
+    assert server.attempts[7] == 2
+
+
+def test_remove_gives_up_after_max_attempts(server):
+    client = RemoveBgClient("key", api_url=server.url, backoff=0, max_attempts=1)
+    assert client.remove(b"img-3") is None
+    client.close()
+    assert server.attempts[3] == 1
+
+
+def test_remove_many_keeps_order_and_bounds_concurrency(server):
+    client = RemoveBgClient("key", api_url=server.url, backoff=0, max_concurrency=3)
+    cutouts = client.remove_many([f"img-{n}".encode() for n in range(12)])
+    client.close()
+
+    assert [cutout.getpixel((0, 0))[0] for cutout in cutouts] == list(range(12))
+    assert all(server.attempts[n] == 2 for n in range(12))
+    assert 1 < server.max_in_flight <= 3
+    # 24 requests over kept-alive connections, at most one per worker thread
+    assert len(server.connections) <= 3
@@ -0,0 +1,32 @@
+"""
+The built-in layout defaults all come from templates/default.json.
+
+Run from the repo root:
+    python -m pytest tests
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import layout
+from template import FlyerTemplate
+from template_spec import compile_spec, read_spec
+
+FONT = os.path.join(ROOT, "fonts", "Poppins-Regular.ttf")
+BACKGROUND = os.path.join(ROOT, "background", "new.png")
+
+
+def test_defaults_are_the_default_template():
+    compiled = compile_spec(read_spec(layout.DEFAULT_TEMPLATE_FILE), name="default")
+    for _, flyer_layout in compiled.layouts:
+        assert flyer_layout == layout.DEFAULT_LAYOUT
+
+    template = FlyerTemplate(BACKGROUND, *[FONT, 90, "#000000"] * 4)
+    assert template.default_layout == layout.DEFAULT_LAYOUT
+
+
+def test_margins_override_the_defaults():
+    template = FlyerTemplate(BACKGROUND, *[FONT, 90, "#000000"] * 4, start_y=1700)
+    assert template.default_layout.body == layout.DEFAULT_BODY._replace(start_y=1700)
@@ -0,0 +1,82 @@
+from collections import OrderedDict
+import threading
+
+
+class TextBlockCache:
+    """
+    Process-wide cache of rasterised text blocks.
+
+    Captions like "1 Year Warranty" or "Colour:" repeat across a whole
+    catalogue, so Flyer.draw_wrapped_text keeps the rendered RGBA block per
+    (text, font, size, fill, box_width, line_spacing, center) in an LRU bounded
+    by the pixel memory of the cached images. Cached images are shared, callers
+    must not draw on them (pasting them is fine).
+    """
+
+    def __init__(self, max_bytes=128 * 1024 ** 2):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._blocks = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _size(img):
+        return img.width * img.height * len(img.getbands())
+
+    def get(self, key, render):
+        """
+        Return the cached (image, number of lines) for key, calling render() on a miss.
+
+        Args:
+            key (tuple): (text, font path, size, fill, box_width, line_spacing, center).
+            render (callable): Rasterises the block, returns (image, number of lines).
+        """
+        with self._lock:
+            block = self._blocks.get(key)
+            if block is not None:
+                self._blocks.move_to_end(key)
+                self.hits += 1
+                return block
+            self.misses += 1
+
+        # Rendered outside the lock, two threads missing the same key just render it twice
+        block = render()
+        size = self._size(block[0])
+        if size > self.max_bytes:
+            return block
+
+        with self._lock:
+            old = self._blocks.pop(key, None)
+            if old is not None:
+                self._bytes -= self._size(old[0])
+            self._blocks[key] = block
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (img, _) = self._blocks.popitem(last=False)
+                self._bytes -= self._size(img)
+        return block
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._blocks),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._blocks.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+
+# Shared cache used by Flyer
+text_cache = TextBlockCache()
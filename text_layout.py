@@ -0,0 +1,84 @@
+from collections import namedtuple
+import functools
+
+
+# One wrapped line: its text, advance width and bottom edge (same as font.getbbox(text)[3])
+WrappedLine = namedtuple("WrappedLine", ["text", "width", "bottom"])
+
+
+@functools.lru_cache(maxsize=16384)
+def word_metrics(font, word):
+    """
+    Measure a single word once per font.
+
+    Returns:
+        tuple: (width, width of " " + word, kerning between the word's last
+        glyph and a following space, bottom of the word's bbox)
+    """
+    width = font.getlength(word)
+    spaced_width = font.getlength(" " + word)
+    last = word[-1]
+    kern_after = font.getlength(last + " ") - font.getlength(last) - font.getlength(" ")
+    bottom = font.getbbox(word)[3]
+    return width, spaced_width, kern_after, bottom
+
+
+def wrap_lines(text, font, box_width):
+    """
+    Greedy word wrap with cached word widths.
+
+    Produces the same breaks as measuring the whole growing line with
+    draw.textlength, but each distinct word is only measured once and
+    line widths are built up by adding word widths plus the kerning
+    around the joining space.
+
+    Args:
+        text (str): The text to wrap.
+        font (PIL.ImageFont.FreeTypeFont): Font used for measuring.
+        box_width (int): Maximum line width.
+
+    Returns:
+        list[WrappedLine]: Wrapped lines with their width and bottom.
+    """
+    lines = []
+    line_words = []
+    line_width = 0
+    line_bottom = 0
+    prev_kern = 0
+
+    for word in text.split():
+        width, spaced_width, kern_after, bottom = word_metrics(font, word)
+
+        if not line_words:
+            line_words = [word]
+            line_width = width
+            line_bottom = bottom
+            prev_kern = kern_after
+            continue
+
+        test_width = line_width + prev_kern + spaced_width
+
+        # Safety net for shaping engines that are not purely additive
+        if abs(test_width - box_width) < 1:
+            test_width = font.getlength(" ".join(line_words + [word]))
+
+        if test_width <= box_width:
+            line_words.append(word)
+            line_width = test_width
+            line_bottom = max(line_bottom, bottom)
+        else:
+            lines.append(WrappedLine(" ".join(line_words), line_width, line_bottom))
+            line_words = [word]
+            line_width = width
+            line_bottom = bottom
+        prev_kern = kern_after
+
+    if line_words:
+        lines.append(WrappedLine(" ".join(line_words), line_width, line_bottom))
+
+    return lines
+
+
+def lines_height(lines, line_spacing=0):
+    """Total height of a block of wrapped lines (no trailing spacing)."""
+    return sum(line.bottom + line_spacing for line in lines) - line_spacing
@@ -0,0 +1,174 @@
+"""
+Lightweight tracing of flyer renders.
+
+A Tracer records a timed span around every traced Flyer method (nested calls
+included, with their depth) and named counters (resize calls, pixels resized,
+fonts loaded, bytes encoded...). Span records go to any number of sinks as
+they finish; a sink is any callable taking a record dict, see logging_sink and
+JsonLinesSink for the usual ones.
+
+    tracer = Tracer(JsonLinesSink("trace.jsonl"), name="row-12")
+    flyer = Flyer(..., tracer=tracer)
+    ...
+    report = tracer.finish()   # {"stages": ..., "counters": ..., "total": ...}
+
+Without a tracer (the default) a traced method costs one attribute check.
+"""
+from collections import Counter
+from contextlib import contextmanager
+import functools
+import threading
+import logging
+import json
+import time
+
+
+class Tracer:
+    """
+    Collects spans and counters of one render.
+
+    Args:
+        *sinks (callable): Called with every span record, and with the summary record on finish().
+        name (str): Added to every record, e.g. the manifest row of a batch job.
+    """
+
+    def __init__(self, *sinks, name=None):
+        self.sinks = list(sinks)
+        self.name = name
+        self.spans = []
+        self.counters = Counter()
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()  # depth of the current span, per thread
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """Time the enclosed block as a span called name (extra attrs are added to its record)."""
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self._local.depth = depth
+            record = {"event": "span", "trace": self.name, "name": name, "depth": depth,
+                      "start": start - self._t0, "seconds": end - start, **attrs}
+            with self._lock:
+                self.spans.append(record)
+            self._emit(record)
+
+    def propagate(self, fn):
+        """
+        fn running at the calling thread's span depth, for work handed to other threads:
+        its spans nest under the current span instead of becoming stages of their own.
+        """
+        depth = getattr(self._local, "depth", 0)
+
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            outer = getattr(self._local, "depth", 0)
+            self._local.depth = depth
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._local.depth = outer
+        return run
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def stages(self):
+        """
+        Returns:
+            dict: Top level span name -> {"seconds": total, "calls": count}, in order of first call.
+        """
+        stages = {}
+        starts = {}
+        with self._lock:
+            for span in self.spans:
+                if span["depth"] == 0:
+                    stage = stages.setdefault(span["name"], {"seconds": 0.0, "calls": 0})
+                    stage["seconds"] += span["seconds"]
+                    stage["calls"] += 1
+                    starts[span["name"]] = min(starts.get(span["name"], span["start"]), span["start"])
+        # Spans are recorded as they end, order the stages by when they started
+        return dict(sorted(stages.items(), key=lambda item: starts[item[0]]))
+
+    def report(self):
+        """
+        Returns:
+            dict: Per-stage breakdown, counters and the total time of the top level spans.
+        """
+        stages = self.stages()
+        with self._lock:
+            counters = dict(self.counters)
+        return {"trace": self.name, "stages": stages, "counters": counters,
+                "total": sum(stage["seconds"] for stage in stages.values())}
+
+    def finish(self):
+        """Send the summary record to the sinks and return it."""
+        record = dict(self.report(), event="summary")
+        self._emit(record)
+        return record
+
+    def _emit(self, record):
+        for sink in self.sinks:
+            sink(record)
+
+
+def traced(method):
+    """Method decorator: a span named after the method when the instance has a tracer."""
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        tracer = self.tracer
+        if tracer is None:
+            return method(self, *args, **kwargs)
+        with tracer.span(name):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+# ---------- SINKS ----------
+
+def logging_sink(logger=None, level=logging.DEBUG):
+    """Sink logging span records at level and summaries at INFO."""
+    logger = logger or logging.getLogger("flyer.trace")
+
+    def sink(record):
+        if record["event"] == "span":
+            logger.log(level, "%s%s %.1f ms", "  " * record["depth"], record["name"], record["seconds"] * 1000)
+        else:
+            stages = ", ".join(f"{name} {stage['seconds'] * 1000:.0f} ms" for name, stage in record["stages"].items())
+            logger.info("%s: %.0f ms (%s) %s", record["trace"] or "flyer", record["total"] * 1000, stages,
+                        record["counters"])
+    return sink
+
+
+class JsonLinesSink:
+    """
+    Sink appending one JSON object per record to a file.
+
+    Lines are written whole and flushed, so several processes can append to the same file.
+
+    Args:
+        fp: Path (opened for appending) or text file object.
+    """
+
+    def __init__(self, fp):
+        self.owned = isinstance(fp, str)
+        self.fp = open(fp, "a") if self.owned else fp
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self.fp.write(line)
+            self.fp.flush()
+
+    def close(self):
+        if self.owned:
+            self.fp.close()